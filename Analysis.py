@@ -0,0 +1,119 @@
+"""Analyses many positions at once across a pool of worker processes. Positions are given as GameRecord position
+encodings; for each one the analysis reports both players' shortest path lengths, the number of legal actions,
+whether the game is decided and the engine's best move at a fixed search depth.
+
+Each worker sets up its engine and a reusable game per board size once, so every position is only decoded into an
+existing game. The engine's transposition table is cleared before each position and the search has no time limit,
+so it solves every endgame layout it reaches that it has not solved yet: a result depends only on the position and
+the depth, and analyze_many() gives exactly what analyze() gives for the same position, whichever worker runs it.
+Solved layouts are kept across positions, so positions from the same game share the work of solving them. Results
+are streamed back in input order.
+
+Example:
+    python Analysis.py --records games.qgr --depth 2 --workers 8 > analysis.jsonl"""
+
+import argparse
+import json
+import os
+from multiprocessing import Pool
+
+from Engine import Engine
+from GameRecord import GameReader, decode_position, encode_position
+
+DEFAULT_DEPTH = 2
+DEFAULT_TABLE_BYTES = 4 * 1024 * 1024
+
+_worker = None  # Analyzer of the current process, set up by _start_worker()
+
+
+class Analyzer:
+    """Analyses positions one at a time with one engine, reusing a game per board size."""
+
+    def __init__(self, depth=DEFAULT_DEPTH, table_bytes=DEFAULT_TABLE_BYTES):
+        """Initializes analyzer.
+        :param: search depth for the best move, most memory the engine's transposition table may use in bytes."""
+        self._depth = depth
+        self._engine = Engine(table_bytes)
+        self._games = {}  # QuoridorGame by board size, set up again for each position
+
+    def analyze(self, position):
+        """:param: bytes from GameRecord.encode_position()
+        :returns: dictionary of results for the position, see analyze()."""
+        size = position[0]
+        game = decode_position(position, 0, self._games.get(size))
+        self._games[size] = game
+        self._engine.clear()  # no table entries from earlier positions, so results do not depend on them
+        winner = game.get_winner()
+        best_move = self._engine.choose_move(game, None, self._depth)
+        return {"path_lengths": [game.shortest_path_length(1), game.shortest_path_length(2)],
+                "legal_actions": len(game.legal_actions()), "decided": winner != 0, "winner": winner,
+                "turn": game.get_turn(), "best_move": best_move,
+                "score": self._engine.get_search_info().get("score") if best_move is not None else None}
+
+
+def analyze(position, depth=DEFAULT_DEPTH):
+    """Analyses one position.
+    :param: bytes from GameRecord.encode_position(), search depth for the best move
+    :returns: dictionary with "path_lengths" (player one and player two, None for a walled in pawn),
+    "legal_actions" (count for the player to move), "decided" and "winner" (0 while in progress), "turn",
+    "best_move" (action tuple, None if the game is over) and "score" (engine score of the best move for the player
+    to move)."""
+    return Analyzer(depth).analyze(position)
+
+
+def analyze_many(positions, depth=DEFAULT_DEPTH, workers=None, chunksize=64, table_bytes=DEFAULT_TABLE_BYTES):
+    """Analyses many positions across worker processes.
+    :param: iterable of GameRecord position encodings, search depth for the best move, number of worker processes
+    (None for one per CPU, 1 to work in this process), positions sent to a worker at a time, transposition table
+    memory per worker in bytes
+    :returns: iterator of analyze() dictionaries in the same order as positions."""
+    if workers is None:
+        workers = os.cpu_count()
+    if workers == 1:
+        analyzer = Analyzer(depth, table_bytes)
+        for position in positions:
+            yield analyzer.analyze(position)
+        return
+    with Pool(workers, _start_worker, (depth, table_bytes)) as pool:
+        for result in pool.imap(_analyze_in_worker, positions, chunksize):
+            yield result
+
+
+def _start_worker(depth, table_bytes):
+    """Sets up the worker process's Analyzer. Runs once in each worker."""
+    global _worker
+    _worker = Analyzer(depth, table_bytes)
+
+
+def _analyze_in_worker(position):
+    """:returns: analysis of one position by the worker process's Analyzer."""
+    return _worker.analyze(bytes(position))
+
+
+def record_positions(paths):
+    """Yields the position after every move of every game in GameRecord files, as position encodings."""
+    for path in paths:
+        with GameReader(path) as reader:
+            for record in reader:
+                game = record.position_at(0)
+                for action in record.actions():
+                    if game.apply(action) is not True:
+                        break  # damaged record, use what was read of it
+                    yield encode_position(game)
+
+
+def main(argv=None):
+    """Runs the command line entry point: prints one JSON line of analysis per position.
+    :param: argument list, or None to use sys.argv"""
+    parser = argparse.ArgumentParser(description="Analyse every position in GameRecord files.")
+    parser.add_argument("--records", nargs="+", required=True, help="GameRecord files to analyse")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="search depth for the best move")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunksize", type=int, default=64, help="positions sent to a worker at a time")
+    args = parser.parse_args(argv)
+    for result in analyze_many(record_positions(args.records), args.depth, args.workers, args.chunksize):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
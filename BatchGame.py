@@ -0,0 +1,202 @@
+import numpy as np
+
+from Quoridor import BOARD_SIZE, DOWN, FENCES, LEFT, RIGHT, SIDESTEPS, UP
+
+HORIZONTAL, VERTICAL = 0, 1  # index of each fence direction in the walls array
+
+
+class BatchGame:
+    """Many independent Quoridor games stored as NumPy arrays and advanced together, for rollouts and training data.
+    The rules are the same as QuoridorGame: one space fences, jumps over the other pawn, diagonal steps when a fence
+    or the edge is behind it, and the fair play rule for both players. Every call works on all games at once with a
+    fixed number of array operations, however many games there are.
+
+    State, with B games on a board of size n:
+        pawns   (B, 2) square index y * n + x of player one's and player two's pawn
+        walls   (B, 2, n, n) fences as walls[game, HORIZONTAL or VERTICAL, y, x], with the outer top and left
+                fences set like QuoridorGame's board
+        fences  (B, 2) fences left for each player
+        turn    (B,) player to move, 1 or 2
+        status  (B,) 0 while in progress, otherwise the number of the winning player
+
+    Actions are integers: a square index s moves the pawn to s, n * n + s places a horizontal fence at s and
+    2 * n * n + s a vertical fence at s."""
+
+    def __init__(self, batch_size, size=BOARD_SIZE, fences=FENCES):
+        """Initializes batch_size games at the starting position.
+        :param: number of games, squares along each side of the board, fences each player starts with."""
+        self.size = size
+        self.squares = size * size
+        self.offsets = np.array([-size, size, -1, 1])  # square offset for UP, DOWN, LEFT, RIGHT
+        self.pawns = np.empty((batch_size, 2), dtype=np.int32)
+        self.pawns[:, 0] = size // 2
+        self.pawns[:, 1] = (size - 1) * size + size // 2
+        self.walls = np.zeros((batch_size, 2, size, size), dtype=bool)
+        self.walls[:, HORIZONTAL, 0, :] = True
+        self.walls[:, VERTICAL, :, 0] = True
+        self.fences = np.full((batch_size, 2), fences, dtype=np.int16)
+        self.turn = np.ones(batch_size, dtype=np.int8)
+        self.status = np.zeros(batch_size, dtype=np.int8)
+
+    @classmethod
+    def from_games(cls, games):
+        """Copies QuoridorGame positions into a batch.
+        :param: list of QuoridorGame objects of the same board size
+        :returns: BatchGame holding the same positions."""
+        size = games[0].get_size()
+        batch = cls(len(games), size)
+        for number, game in enumerate(games):
+            for player in (1, 2):
+                x, y = game.check_player(player).get_player_position()
+                batch.pawns[number, player - 1] = y * size + x
+                batch.fences[number, player - 1] = game.check_player(player).get_fences()
+            for (x, y), entries in game.get_board().items():
+                batch.walls[number, HORIZONTAL, y, x] = "h" in entries
+                batch.walls[number, VERTICAL, y, x] = "v" in entries
+            batch.turn[number] = game.get_turn()
+            batch.status[number] = game.get_winner()
+        return batch
+
+    def __len__(self):
+        """:returns: number of games in the batch."""
+        return len(self.turn)
+
+    def blocked(self, walls=None):
+        """Works out which moves fences and the edge of the board stop.
+        :param: walls array, or None for this batch's walls
+        :returns: (B, 4, n, n) bool array, True where a pawn cannot leave square (y, x) in each direction."""
+        if walls is None:
+            walls = self.walls
+        horizontal = walls[:, HORIZONTAL]
+        vertical = walls[:, VERTICAL]
+        down = np.ones_like(horizontal)
+        down[:, :-1, :] = horizontal[:, 1:, :]
+        right = np.ones_like(vertical)
+        right[:, :, :-1] = vertical[:, :, 1:]
+        return np.stack([horizontal, down, vertical, right], axis=1)
+
+    def pawn_move_mask(self):
+        """:returns: (B, n * n) bool array of the squares the player to move can move its pawn to."""
+        count = len(self)
+        rows = np.arange(count)
+        squares = self.squares
+        blocked = self.blocked().reshape(count, 4, squares)
+        mover = self.pawns[rows, self.turn - 1]
+        opponent = self.pawns[rows, 2 - self.turn]
+        active = self.status == 0
+        mask = np.zeros((count, squares + 1), dtype=bool)  # last column collects moves that are not allowed
+        for direction in (UP, DOWN, LEFT, RIGHT):
+            open_step = active & ~blocked[rows, direction, mover]
+            step = np.where(open_step, mover + self.offsets[direction], squares)
+            mask[rows, np.where(open_step & (step != opponent), step, squares)] = True
+            meets_opponent = open_step & (step == opponent)
+            behind_blocked = blocked[rows, direction, opponent]
+            jump = meets_opponent & ~behind_blocked
+            mask[rows, np.where(jump, opponent + self.offsets[direction], squares)] = True
+            for side in SIDESTEPS[direction]:  # straight jump blocked, step diagonally around the opponent
+                sidestep = meets_opponent & behind_blocked & ~blocked[rows, side, opponent]
+                mask[rows, np.where(sidestep, opponent + self.offsets[side], squares)] = True
+        return mask[:, :squares]
+
+    def fence_mask(self):
+        """:returns: (B, 2, n * n) bool array of the fences the player to move can place, indexed by HORIZONTAL or
+        VERTICAL and then square, including the fair play rule."""
+        count = len(self)
+        rows = np.arange(count)
+        mask = ~self.walls.reshape(count, 2, self.squares)
+        mask &= ((self.status == 0) & (self.fences[rows, self.turn - 1] > 0))[:, None, None]
+        games, kinds, squares = np.nonzero(mask & self._may_enclose())
+        if len(games):
+            mask[games, kinds, squares] = self._keeps_paths_open(games, kinds, squares)
+        return mask
+
+    def legal_action_mask(self):
+        """:returns: (B, 3 * n * n) bool array of legal actions for the player to move, indexed by action number."""
+        count = len(self)
+        return np.concatenate([self.pawn_move_mask(), self.fence_mask().reshape(count, 2 * self.squares)], axis=1)
+
+    def reachable(self, walls, pawns):
+        """Flood fills from each player's goal row to check that both pawns can still get there. Runs one array
+        step per row of distance, stopping as soon as the fill stops growing.
+        :param: (K, 2, n, n) walls array, (K, 2) pawns array
+        :returns: (K, 2) bool array, True where that player's pawn can reach its goal row."""
+        count = len(walls)
+        size = self.size
+        open_step = ~self.blocked(walls)
+        reach = np.zeros((count, 2, size, size), dtype=bool)
+        reach[:, 0, size - 1, :] = True  # player one heads for the last row
+        reach[:, 1, 0, :] = True  # player two heads for the first row
+        while True:
+            grown = reach.copy()
+            grown[:, :, 1:, :] |= reach[:, :, :-1, :] & open_step[:, None, UP, 1:, :]
+            grown[:, :, :-1, :] |= reach[:, :, 1:, :] & open_step[:, None, DOWN, :-1, :]
+            grown[:, :, :, 1:] |= reach[:, :, :, :-1] & open_step[:, None, LEFT, :, 1:]
+            grown[:, :, :, :-1] |= reach[:, :, :, 1:] & open_step[:, None, RIGHT, :, :-1]
+            if np.array_equal(grown, reach):
+                break
+            reach = grown
+        rows = np.arange(count)
+        flat = reach.reshape(count, 2, self.squares)
+        return np.stack([flat[rows, 0, pawns[:, 0]], flat[rows, 1, pawns[:, 1]]], axis=1)
+
+    def step(self, actions):
+        """Plays one action in every game. Illegal actions, and actions for games that are already won, leave that
+        game unchanged, like move_pawn and place_fence returning False.
+        :param: (B,) integer array of actions for the player to move in each game
+        :returns: (B,) bool array, True where the action was played."""
+        actions = np.asarray(actions)
+        count = len(self)
+        rows = np.arange(count)
+        squares = self.squares
+        square = actions % squares
+        kind = actions // squares  # 0 pawn move, 1 horizontal fence, 2 vertical fence
+        is_move = (kind == 0) & (actions >= 0)
+        is_fence = (kind == 1) | (kind == 2)
+        fence_kind = np.clip(kind - 1, 0, 1)
+        mover = self.turn - 1
+
+        legal = is_move & self.pawn_move_mask()[rows, square]
+        fence_ok = is_fence & (self.status == 0) & (self.fences[rows, mover] > 0) & \
+            ~self.walls.reshape(count, 2, squares)[rows, fence_kind, square]
+        risky = fence_ok & self._may_enclose()[rows, fence_kind, square]
+        games = np.nonzero(risky)[0]
+        if len(games):
+            fence_ok[games] = self._keeps_paths_open(games, fence_kind[games], square[games])
+        legal |= fence_ok
+
+        moved = np.nonzero(legal & is_move)[0]
+        self.pawns[moved, mover[moved]] = square[moved]
+        goal = np.where(mover[moved] == 0, self.size - 1, 0)
+        won = moved[square[moved] // self.size == goal]
+        self.status[won] = self.turn[won]
+
+        fenced = np.nonzero(fence_ok)[0]
+        self.walls[fenced, fence_kind[fenced], square[fenced] // self.size, square[fenced] % self.size] = True
+        self.fences[fenced, mover[fenced]] -= 1
+
+        self.turn[legal] = 3 - self.turn[legal]
+        return legal
+
+    def _may_enclose(self):
+        """:returns: (B, 2, n * n) bool array, True for fence slots whose two ends both touch a fence or the edge
+        of the board. Any other fence has a free end, so it cannot cut the board in two."""
+        count = len(self)
+        size = self.size
+        touched = np.zeros((count, size + 1, size + 1), dtype=bool)  # corners, touched[game, y, x]
+        touched[:, 0, :] = touched[:, size, :] = touched[:, :, 0] = touched[:, :, size] = True
+        horizontal = self.walls[:, HORIZONTAL]
+        vertical = self.walls[:, VERTICAL]
+        touched[:, :size, :size] |= horizontal | vertical
+        touched[:, :size, 1:] |= horizontal
+        touched[:, 1:, :size] |= vertical
+        corner = touched[:, :size, :size]
+        enclose = np.stack([corner & touched[:, :size, 1:], corner & touched[:, 1:, :size]], axis=1)
+        return enclose.reshape(count, 2, self.squares)
+
+    def _keeps_paths_open(self, games, kinds, squares):
+        """Checks the fair play rule for one new fence in each of several games.
+        :param: equal length arrays of game numbers, fence kinds (HORIZONTAL or VERTICAL) and squares
+        :returns: bool array, True where both players still have a path with the fence added."""
+        walls = self.walls[games]
+        walls[np.arange(len(games)), kinds, squares // self.size, squares % self.size] = True
+        return self.reachable(walls, self.pawns[games]).all(axis=1)
@@ -0,0 +1,187 @@
+"""Benchmarks the rules engine hot paths on fixed, seeded positions so results can be compared between revisions.
+
+Each operation is timed call by call on every position and reported as operations per second with 50th, 90th and
+99th percentile latency. Memory per game is measured with tracemalloc. Use --json for machine-readable output and
+--compare to show the change against a saved --json result.
+
+Example:
+    python Benchmark.py --json > before.json
+    python Benchmark.py --compare before.json"""
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from Quoridor import QuoridorGame
+
+
+def build_positions(seed):
+    """Builds the benchmark positions from a seed. Each position is the list of actions that reaches it, so it can
+    be rebuilt exactly.
+    :returns: dictionary of position name to action list."""
+    generator = random.Random(seed)
+    positions = {"open": []}
+
+    game = QuoridorGame()
+    maze = []
+    while game.get_player_two().get_fences() > 2:  # both players place eight fences
+        action = generator.choice(game.legal_fence_placements(game.get_turn()))
+        game.apply(action)
+        maze.append(action)
+    positions["maze"] = maze
+
+    positions["jump"] = [("move", (4, 1)), ("move", (4, 7)), ("move", (4, 2)), ("move", (4, 6)),
+                         ("move", (4, 3)), ("move", (4, 5)), ("h", (4, 7)), ("move", (4, 4))]  # pawns face to face
+    positions["diagonal"] = positions["jump"] + [("h", (4, 5)), ("h", (0, 5))]  # jump blocked by a fence
+    return positions
+
+
+def replay(actions):
+    """:returns: new QuoridorGame with actions played."""
+    game = QuoridorGame()
+    for action in actions:
+        if game.apply(action) is not True:
+            raise ValueError("benchmark position is not legal: %r" % (action,))
+    return game
+
+
+def time_calls(function, arguments, iterations):
+    """Calls function once per iteration, cycling through arguments.
+    :returns: list of call times in nanoseconds."""
+    timings = []
+    clock = time.perf_counter_ns
+    for number in range(iterations):
+        argument = arguments[number % len(arguments)]
+        start = clock()
+        function(*argument)
+        timings.append(clock() - start)
+    return timings
+
+
+def summarize(timings):
+    """:returns: dictionary of calls, operations per second and latency percentiles in microseconds."""
+    ordered = sorted(timings)
+    total = sum(ordered)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] / 1000
+
+    return {"calls": len(ordered), "ops_per_sec": len(ordered) / (total / 1e9) if total else 0.0,
+            "p50_us": percentile(0.5), "p90_us": percentile(0.9), "p99_us": percentile(0.99)}
+
+
+def bench_position(actions, iterations, seed):
+    """Times each operation on one position.
+    :returns: dictionary of operation name to summary."""
+    game = replay(actions)
+    player = game.get_turn()
+    location = game.check_player(player).get_player_position()
+    x, y = location
+    results = {}
+
+    targets = [(player, location, (tx, ty)) for tx in range(9) for ty in range(9)]
+    results["validate_pawn_move"] = summarize(time_calls(game.validate_pawn_move, targets, iterations))
+
+    steps = [(location, (x + dx, y + dy)) for dx, dy in ((0, -1), (0, 1), (-1, 0), (1, 0))]
+    results["check_fence_block"] = summarize(time_calls(game.check_fence_block, steps, iterations))
+
+    placements = [(player,) + fence for fence in game.legal_fence_placements(player)]
+
+    def place_and_undo(player, fence_direction, coordinate):
+        start = time.perf_counter_ns()
+        game.place_fence(player, fence_direction, coordinate)
+        elapsed = time.perf_counter_ns() - start
+        game.undo()
+        return elapsed
+
+    if placements:
+        results["place_fence"] = summarize([place_and_undo(*placements[number % len(placements)])
+                                            for number in range(iterations)])
+
+    results["legal_actions"] = summarize(time_calls(game.legal_actions, [()], max(1, iterations // 10)))
+
+    generator = random.Random(seed)
+
+    def random_game():
+        played = replay(actions)  # rebuilt before the clock starts, so only the game itself is timed
+        start = time.perf_counter_ns()
+        while played.get_status() == "IN PROGRESS":
+            mover = played.get_turn()
+            if generator.random() < 0.2 and played.check_player(mover).get_fences() > 0:
+                fences = played.path_blocking_fences(3 - mover)
+                if fences:
+                    played.apply(generator.choice(fences))
+                    continue
+            moves = played.legal_pawn_moves(mover)
+            if not moves:
+                break  # pawn is boxed in, the game cannot go on
+            played.apply(("move", min(moves, key=lambda move: played.distance_to_goal(mover, move))))
+        return time.perf_counter_ns() - start
+
+    results["random_game"] = summarize([random_game() for _ in range(max(1, iterations // 100))])
+    return results
+
+
+def memory_per_game(actions, copies=200):
+    """:returns: bytes allocated per game instance holding the position, averaged over copies games."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [replay(actions) for _ in range(copies)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del games
+    return (after - before) // copies
+
+
+def run(iterations, seed):
+    """:returns: dictionary of position name to operation summaries and memory per game."""
+    results = {}
+    for name, actions in build_positions(seed).items():
+        results[name] = {"operations": bench_position(actions, iterations, seed),
+                         "bytes_per_game": memory_per_game(actions)}
+    return results
+
+
+def print_table(results, baseline=None):
+    """Prints results as a table, with the change in operations per second against baseline if given."""
+    print("%-10s %-20s %14s %10s %10s %10s %9s" % ("position", "operation", "ops/sec", "p50 us", "p90 us", "p99 us",
+                                                   "change"))
+    for name, position in results.items():
+        for operation, summary in position["operations"].items():
+            change = ""
+            if baseline is not None and operation in baseline.get(name, {}).get("operations", {}):
+                before = baseline[name]["operations"][operation]["ops_per_sec"]
+                change = "%+.1f%%" % (100 * (summary["ops_per_sec"] / before - 1))
+            print("%-10s %-20s %14.1f %10.1f %10.1f %10.1f %9s" % (
+                name, operation, summary["ops_per_sec"], summary["p50_us"], summary["p90_us"], summary["p99_us"],
+                change))
+        print("%-10s %-20s %14d bytes" % (name, "memory per game", position["bytes_per_game"]))
+
+
+def main(argv=None):
+    """Runs the command line entry point.
+    :param: argument list, or None to use sys.argv
+    :returns: results dictionary."""
+    parser = argparse.ArgumentParser(description="Benchmark the Quoridor rules engine.")
+    parser.add_argument("--iterations", type=int, default=2000, help="calls timed per operation and position")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the maze position and random games")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--compare", help="JSON file from an earlier --json run to compare against")
+    args = parser.parse_args(argv)
+
+    results = run(args.iterations, args.seed)
+    if args.json:
+        print(json.dumps({"iterations": args.iterations, "seed": args.seed, "results": results}, indent=2))
+    else:
+        baseline = None
+        if args.compare:
+            with open(args.compare) as saved:
+                baseline = json.load(saved)["results"]
+        print_table(results, baseline)
+    return results
+
+
+if __name__ == "__main__":
+    main()
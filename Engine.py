@@ -0,0 +1,270 @@
+import time
+
+from Quoridor import TranspositionTable
+from Tablebase import DRAW, WIN, solve
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when the time budget runs out. Engine catches it and returns the best move so far."""
+
+
+class Engine:
+    """Computer opponent for QuoridorGame. The engine picks a move for the player whose turn it is using
+    iterative-deepening alpha-beta search within a time budget given in milliseconds. Each finished depth replaces
+    the move to play, so when time runs out the engine returns the best move from the deepest search it completed,
+    or from the unfinished one if it had already found a better move there.
+
+    Positions are scored from the point of view of the player to move as the difference in shortest path lengths
+    plus the difference in fences left. The search tries the move stored in the transposition table first, then
+    pawn moves that shorten the mover's path, then fences that lengthen the opponent's path. Only fences that cut
+    one of the opponent's shortest paths are searched, since no other fence can slow the opponent down, except when
+    the mover's pawn is boxed in and none of them is legal: then every fence is searched.
+
+    Once both players are out of fences the engine plays from an endgame Tablebase instead of searching, and the
+    search scores such positions from the tablebase too, so these endgames are played perfectly. Tablebases come
+    from a TablebaseFile when one is given and has the layout, and are otherwise solved when the game reaches the
+    layout and kept. Solving takes about 50 ms on the 9x9 board and grows with the fourth power of the size, so it
+    is only done when it fits in half the time budget; otherwise the engine searches as usual and a later move with
+    a larger budget, or one without a limit, solves the layout. A search without a time limit also solves every
+    layout it reaches, so its result never depends on which layouts earlier moves happened to solve.
+
+    The engine explores moves with QuoridorGame.apply() and undo(), so the game passed in is left exactly as it was."""
+
+    WIN = 100000  # score for a won position, reduced by the number of moves needed to reach it
+    PATH_WEIGHT = 10  # score per move of shortest path difference
+    FENCE_WEIGHT = 3  # score per fence left in hand
+    MAX_DEPTH = 64  # deepest iteration tried when no depth limit is given
+    SOLVED_LAYOUTS = 32  # most solved tablebases kept, about 26 KB each on the 9x9 board
+    SOLVE_MICROSECONDS = 5  # rough time to solve one tablebase position, used to keep solving within the budget
+
+    def __init__(self, table_bytes=16 * 1024 * 1024, tablebases=None, solve_endgames=True):
+        """Initializes engine.
+        :param: most memory its transposition table may use in bytes, TablebaseFile to look endgames up in or None,
+        whether to solve endgames the file does not have."""
+        self._table = TranspositionTable(table_bytes)
+        self._tablebases = tablebases
+        self._solve_endgames = solve_endgames
+        self._solved = {}  # Tablebase by wall key, for layouts solved or found in the file during play
+        self._deadline = None
+        self._nodes = 0
+        self._partial = None  # best (move, score) from an unfinished depth
+        self._search_info = {}
+
+    def get_transposition_table(self):
+        """:returns: the engine's TranspositionTable."""
+        return self._table
+
+    def get_search_info(self):
+        """:returns: dictionary describing the last search: depth completed, nodes searched, score and time taken
+        in milliseconds."""
+        return self._search_info
+
+    def clear(self):
+        """Forgets the transposition table entries stored by earlier searches. Solved tablebases are kept: they are
+        exact, and a search without a time limit solves any layout it reaches that is missing, so keeping them only
+        saves time."""
+        self._table.clear()
+
+    def choose_move(self, game, time_limit_ms=1000, depth=None):
+        """Picks a move for the player whose turn it is.
+        :param: QuoridorGame, time budget in milliseconds (None for no limit), deepest search depth (None for no
+        limit). At least one of the limits must be given.
+        :returns: action tuple for QuoridorGame.apply(), or None if the game is already won."""
+        if game.get_status() != "IN PROGRESS":
+            return None
+        start = time.perf_counter()
+        positions = 2 * game.get_size() ** 4  # positions in a tablebase
+        solve_missing = time_limit_ms is None or positions * self.SOLVE_MICROSECONDS <= time_limit_ms * 500
+        tablebase = self._endgame_tablebase(game, solve_missing)
+        if tablebase is not None:
+            move = tablebase.best_move(game)
+            if move is not None:
+                result, moves = tablebase.probe(game)
+                self._search_info = {"depth": 0, "nodes": 0, "score": self._tablebase_score(result, moves, 0),
+                                     "time_ms": (time.perf_counter() - start) * 1000, "tablebase": result}
+                return move
+        if time_limit_ms is None:
+            self._deadline = None
+        else:
+            self._deadline = start + time_limit_ms / 1000
+        self._nodes = 0
+        self._partial = None
+        self._table.new_search()
+        previous_table = game.get_transposition_table()
+        previous_limit = game.get_undo_limit()
+        game.set_transposition_table(self._table)  # share fair play results between searches
+        game.set_undo_limit(None)  # the search takes back every move it tries, however deep
+
+        actions = self._ordered_actions(game, None)
+        if not actions:
+            game.set_transposition_table(previous_table)
+            game.set_undo_limit(previous_limit)
+            return None  # pawn is boxed in and no fence can be placed
+        best_move, best_score, completed = actions[0], None, 0
+        try:
+            for current_depth in range(1, (depth or self.MAX_DEPTH) + 1):
+                move, score = self._search_root(game, actions, current_depth)
+                if move is None:
+                    break  # ran out of time during this depth
+                best_move, best_score, completed = move, score, current_depth
+                actions.remove(move)
+                actions.insert(0, move)  # search the best move first at the next depth
+                if abs(score) >= self.WIN - self.MAX_DEPTH:
+                    break  # forced win or loss found
+        finally:
+            game.set_transposition_table(previous_table)
+            game.set_undo_limit(previous_limit)
+        if self._partial is not None:
+            best_move, best_score = self._partial  # unfinished depth already found a better move
+        self._search_info = {"depth": completed, "nodes": self._nodes, "score": best_score,
+                             "time_ms": (time.perf_counter() - start) * 1000}
+        return best_move
+
+    def evaluate(self, game):
+        """Scores a position from the point of view of the player whose turn it is.
+        :param: QuoridorGame in progress
+        :returns: integer score, higher is better for the player to move."""
+        player = game.get_turn()
+        opponent = 3 - player
+        path_difference = game.shortest_path_length(opponent) - game.shortest_path_length(player)
+        fence_difference = game.check_player(player).get_fences() - game.check_player(opponent).get_fences()
+        return path_difference * self.PATH_WEIGHT + fence_difference * self.FENCE_WEIGHT
+
+    def _search_root(self, game, actions, depth):
+        """Searches every root action to depth.
+        :returns: (best action, score), or (None, None) if time ran out before the first action was searched.
+        If time runs out later, the best move found so far in this depth is kept in self._partial."""
+        self._partial = None
+        alpha = -self.WIN - 1
+        best_move = None
+        try:
+            for action in actions:
+                game.apply(action)
+                try:
+                    score = -self._search(game, depth - 1, -self.WIN - 1, -alpha, 1)
+                finally:
+                    game.undo()
+                if best_move is None or score > alpha:
+                    best_move, alpha = action, score
+                    if depth > 1:
+                        self._partial = (best_move, alpha)
+        except SearchTimeout:
+            return None, None
+        self._partial = None
+        self._table.store(game.get_zobrist_key(), depth, alpha, TranspositionTable.EXACT, best_move)
+        return best_move, alpha
+
+    def _search(self, game, depth, alpha, beta, ply):
+        """Negamax alpha-beta search.
+        :returns: score of the position for the player to move."""
+        self._nodes += 1
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+        if game.get_status() != "IN PROGRESS":
+            return ply - self.WIN  # the player who just moved reached the other side
+        tablebase = self._endgame_tablebase(game, self._deadline is None)
+        if tablebase is not None:
+            result, moves = tablebase.probe(game)
+            return self._tablebase_score(result, moves, ply)  # exact, so no need to search further
+        if depth == 0:
+            return self.evaluate(game)
+
+        key = game.get_zobrist_key()
+        entry = self._table.probe(key)
+        table_move = None
+        if entry is not None:
+            entry_depth, value, flag, table_move = entry
+            if entry_depth >= depth:
+                if flag == TranspositionTable.EXACT:
+                    return value
+                elif flag == TranspositionTable.LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        original_alpha = alpha
+        best_score, best_move = -self.WIN - 1, None
+        for action in self._ordered_actions(game, table_move):
+            game.apply(action)
+            try:
+                score = -self._search(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.undo()
+            if score > best_score:
+                best_score, best_move = score, action
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break  # opponent will avoid this position
+        if best_move is None:
+            return self.evaluate(game)  # no legal action, the player to move can only pass
+
+        if best_score <= original_alpha:
+            flag = TranspositionTable.UPPER
+        elif best_score >= beta:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        self._table.store(key, depth, best_score, flag, best_move)
+        return best_score
+
+    def _endgame_tablebase(self, game, solve_missing=False):
+        """:param: QuoridorGame, whether to solve the layout if no tablebase has it and solving is turned on. The
+        search passes False when it has a time limit, since solving takes tens of milliseconds and most layouts it
+        looks at are never played, and so does choose_move() when solving would not fit in its time budget.
+        :returns: Tablebase for the game's fences if both players are out of fences and one is available,
+        otherwise None."""
+        if game.get_player_one().get_fences() != 0 or game.get_player_two().get_fences() != 0:
+            return None
+        key = game.get_wall_key()
+        tablebase = self._solved.get(key)
+        if tablebase is None and self._tablebases is not None:
+            tablebase = self._tablebases.find_game(game)
+        if tablebase is None and solve_missing and self._solve_endgames:
+            state = game.get_state()
+            tablebase = solve(game.get_size(), state[4], state[5])
+        if tablebase is not None and not tablebase.matches(game):
+            return None  # another layout with the same key
+        if tablebase is not None and key not in self._solved:
+            if len(self._solved) >= self.SOLVED_LAYOUTS:
+                self._solved.pop(next(iter(self._solved)))  # drop the oldest layout
+            self._solved[key] = tablebase
+        return tablebase
+
+    def _tablebase_score(self, result, moves, ply):
+        """:returns: search score for a tablebase result at ply, on the same scale as a win found by search."""
+        if result == WIN:
+            return self.WIN - (ply + moves)
+        elif result == DRAW:
+            return 0
+        return (ply + moves) - self.WIN
+
+    def _ordered_actions(self, game, table_move):
+        """Lists the actions to search for the player to move, most promising first: the transposition table move,
+        the pawn move that shortens the mover's path most, fences that lengthen the opponent's path most, then the
+        remaining pawn moves. Fences that do not lengthen the opponent's path are left out, unless the pawn is boxed
+        in and no fence lengthens it: then every legal action is listed, since placing any fence is the only move."""
+        player = game.get_turn()
+        opponent = 3 - player
+        pawn_moves = [("move", coordinate) for coordinate in game.legal_pawn_moves(player)]
+        pawn_moves.sort(key=lambda action: game.distance_to_goal(player, action[1]))
+
+        own_length = game.shortest_path_length(player)
+        opponent_length = game.shortest_path_length(opponent)
+        scored_fences = []
+        for action in game.path_blocking_fences(opponent):
+            lengths = game.path_lengths_after_fence(action[0], action[1])
+            gain = lengths[opponent - 1] - opponent_length
+            if gain > 0:
+                scored_fences.append((gain - (lengths[player - 1] - own_length), action))
+        scored_fences.sort(key=lambda scored: -scored[0])
+
+        actions = pawn_moves[:1] + [action for _, action in scored_fences] + pawn_moves[1:]
+        if not actions:
+            actions = game.legal_actions()  # boxed in pawn, any fence will do
+        if table_move is not None and table_move in actions:
+            actions.remove(table_move)
+            actions.insert(0, table_move)
+        return actions
@@ -0,0 +1,322 @@
+"""Compact binary game records. A record file is a sequence of games, each one a fixed header followed by one code
+per move, with a snapshot of the full position every few moves so any position can be rebuilt without replaying
+the game from the start. GameReader reads record files through mmap, so an archive of any size is never loaded
+into memory, and checks every game against the rules as it replays it.
+
+Action codes, for a board of size n: a square index y * n + x moves the pawn there, n * n + square places a
+horizontal fence and 2 * n * n + square a vertical fence. Codes take one byte when every code fits below 255,
+which covers the 9x9 board, and two bytes otherwise. The largest code value marks a snapshot, so records hold
+boards of up to 147x147 squares, the largest whose codes all fit below 65535, and up to 255 fences per player.
+Positions can be encoded on boards of up to 255x255 squares.
+
+Header, big-endian: magic "QG", format version, board size, fences per player, snapshot interval (0 for none),
+result (0 unfinished, otherwise the winning player), number of moves, length of the body in bytes.
+
+Position encoding, used for snapshots and by encode_position: board size, player one square and player two square
+as two-byte integers, player one and player two fences left, a byte holding the turn plus four times the winner
+(0 while in progress), then the horizontal and vertical fence bitmasks as little-endian integers of
+ceil(n * n / 8) bytes each."""
+
+import mmap
+import struct
+
+from Quoridor import BOARD_SIZE, FENCES, MoveTables, QuoridorGame
+
+MAGIC = b"QG"
+VERSION = 1
+HEADER = struct.Struct(">2sBBBBBII")
+POSITION_HEADER = struct.Struct(">BHHBBB")
+DEFAULT_SNAPSHOT_INTERVAL = 32
+MAX_RECORD_SIZE = 147  # largest board whose action codes all fit below the two-byte snapshot marker
+MAX_POSITION_SIZE = 255  # largest board whose size and square indexes fit the position header
+MAX_FENCES = 255  # fence counts are stored in one byte
+
+
+def code_width(size):
+    """:returns: bytes per action code on a board of size squares per side."""
+    if 3 * size * size < 255:
+        return 1
+    return 2
+
+
+def snapshot_marker(size):
+    """:returns: code value that marks a snapshot."""
+    return (1 << (8 * code_width(size))) - 1
+
+
+def action_code(action, size):
+    """:param: action tuple, board size
+    :returns: integer code for the action."""
+    x, y = action[1]
+    square = y * size + x
+    if action[0] == "move":
+        return square
+    elif action[0] == "h":
+        return size * size + square
+    return 2 * size * size + square
+
+
+def code_action(code, size):
+    """:param: integer code, board size
+    :returns: action tuple for the code, shared with QuoridorGame.legal_actions(), or None if the code is not an
+    action."""
+    tables = MoveTables.for_size(size)
+    squares = size * size
+    if code < squares:
+        return tables.move_actions[code]
+    elif code < 2 * squares:
+        return tables.fence_actions["h"][code - squares]
+    elif code < 3 * squares:
+        return tables.fence_actions["v"][code - 2 * squares]
+    return None
+
+
+def position_length(size):
+    """:returns: length in bytes of an encoded position on a board of size squares per side."""
+    return POSITION_HEADER.size + 2 * ((size * size + 7) // 8)
+
+
+def encode_position(game):
+    """:param: QuoridorGame
+    :returns: bytes encoding the position."""
+    position_one, position_two, fences_one, fences_two, horizontal, vertical, turn, status = game.get_state()
+    size = game.get_size()
+    if size > MAX_POSITION_SIZE or max(fences_one, fences_two) > MAX_FENCES:
+        raise ValueError("positions hold boards of up to %dx%d squares and up to %d fences per player" % (
+            MAX_POSITION_SIZE, MAX_POSITION_SIZE, MAX_FENCES))
+    mask_bytes = (size * size + 7) // 8
+    winner = game.get_winner()
+    return POSITION_HEADER.pack(size, position_one[1] * size + position_one[0],
+                                position_two[1] * size + position_two[0], fences_one, fences_two,
+                                turn + 4 * winner) + \
+        horizontal.to_bytes(mask_bytes, "little") + vertical.to_bytes(mask_bytes, "little")
+
+
+def decode_position(data, offset=0, game=None):
+    """Rebuilds a position from encode_position() bytes.
+    :param: bytes-like object, offset of the position in it, QuoridorGame to set up or None for a new one
+    :returns: QuoridorGame holding the position. Raises ValueError if the data is not a valid position."""
+    size, square_one, square_two, fences_one, fences_two, turn_status = POSITION_HEADER.unpack_from(data, offset)
+    squares = size * size
+    mask_bytes = (squares + 7) // 8
+    start = offset + POSITION_HEADER.size
+    if len(data) < start + 2 * mask_bytes:
+        raise ValueError("position is cut off")
+    if square_one >= squares or square_two >= squares or square_one == square_two or turn_status % 4 not in (1, 2):
+        raise ValueError("position is not valid")
+    horizontal = int.from_bytes(data[start:start + mask_bytes], "little")
+    vertical = int.from_bytes(data[start + mask_bytes:start + 2 * mask_bytes], "little")
+    if (horizontal | vertical) >> squares:
+        raise ValueError("fence mask has fences past the end of the board")
+    winner = turn_status // 4
+    status = "IN PROGRESS"
+    if winner:
+        status = "PLAYER " + str(winner) + " WINS"
+    if game is None:
+        game = QuoridorGame(size, FENCES)
+    elif game.get_size() != size:
+        raise ValueError("position is for a %dx%d board" % (size, size))
+    game.set_state(((square_one % size, square_one // size), (square_two % size, square_two // size),
+                    fences_one, fences_two, horizontal, vertical, turn_status % 4, status))
+    return game
+
+
+def encode_game(actions, size=BOARD_SIZE, fences=FENCES, snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL):
+    """Replays a game through the rules and encodes it.
+    :param: list of action tuples, board size, fences per player, moves between snapshots (0 for none)
+    :returns: bytes of the record. Raises ValueError if an action is not legal or the game does not fit the
+    format."""
+    if size > MAX_RECORD_SIZE or fences > MAX_FENCES:
+        raise ValueError("records hold boards of up to %dx%d squares and up to %d fences per player" % (
+            MAX_RECORD_SIZE, MAX_RECORD_SIZE, MAX_FENCES))
+    if not 0 <= snapshot_interval <= 255:
+        raise ValueError("snapshot interval must be from 0 to 255 moves")
+    game = QuoridorGame(size, fences)
+    width = code_width(size)
+    code_format = ">B" if width == 1 else ">H"
+    marker = struct.pack(code_format, snapshot_marker(size))
+    body = bytearray()
+    for ply, action in enumerate(actions, 1):
+        if game.apply(action) is not True:
+            raise ValueError("move %d is not legal: %r" % (ply, action))
+        body += struct.pack(code_format, action_code(action, size))
+        if snapshot_interval and ply % snapshot_interval == 0:
+            body += marker + encode_position(game)
+    return HEADER.pack(MAGIC, VERSION, size, fences, snapshot_interval, game.get_winner(), len(actions),
+                       len(body)) + bytes(body)
+
+
+class GameWriter:
+    """Appends encoded games to a record file."""
+
+    def __init__(self, path, snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL):
+        """Opens path for appending.
+        :param: file path, moves between snapshots (0 for none)."""
+        self._file = open(path, "ab")
+        self._snapshot_interval = snapshot_interval
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, actions, size=BOARD_SIZE, fences=FENCES):
+        """Validates and appends one game.
+        :param: list of action tuples, board size, fences per player
+        :returns: number of bytes written."""
+        record = encode_game(actions, size, fences, self._snapshot_interval)
+        self._file.write(record)
+        return len(record)
+
+    def close(self):
+        """Flushes and closes the file."""
+        self._file.close()
+
+
+class GameReader:
+    """Reads a record file through mmap. Iterating yields one GameRecord at a time; only the bytes of the game
+    being looked at are touched."""
+
+    def __init__(self, path):
+        """Maps the file at path."""
+        self._file = open(path, "rb")
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._data = b""  # empty file cannot be mapped
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        """Yields each game in the file in order. Raises ValueError at a damaged header."""
+        offset = 0
+        while offset < len(self._data):
+            record = GameRecord(self._data, offset)
+            yield record
+            offset = record.get_end()
+
+    def validate(self):
+        """Replays every game through the rules.
+        :returns: number of games. Raises ValueError at the first game that does not follow the rules."""
+        count = 0
+        for record in self:
+            record.replay()
+            count += 1
+        return count
+
+    def close(self):
+        """Unmaps and closes the file."""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+class GameRecord:
+    """One game in a record file, read on demand from the underlying buffer."""
+
+    def __init__(self, data, offset):
+        """Reads the header of the game at offset in data.
+        Raises ValueError if the header is damaged or the game runs past the end of the data."""
+        if len(data) < offset + HEADER.size:
+            raise ValueError("game header at byte %d is cut off" % offset)
+        magic, version, size, fences, interval, result, plies, body_length = HEADER.unpack_from(data, offset)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("no game record at byte %d" % offset)
+        if not 2 <= size <= MAX_RECORD_SIZE:
+            raise ValueError("game at byte %d has a board size records cannot hold" % offset)
+        self._data = data
+        self._body = offset + HEADER.size
+        self._end = self._body + body_length
+        if len(data) < self._end:
+            raise ValueError("game at byte %d is cut off" % offset)
+        self._size = size
+        self._fences = fences
+        self._interval = interval
+        self._result = result
+        self._plies = plies
+        self._width = code_width(size)
+        self._snapshot_length = self._width + position_length(size)
+
+    def get_end(self):
+        """:returns: offset just past this game."""
+        return self._end
+
+    def get_size(self):
+        """:returns: board size."""
+        return self._size
+
+    def get_plies(self):
+        """:returns: number of moves in the game."""
+        return self._plies
+
+    def get_result(self):
+        """:returns: 0 if the game was unfinished, otherwise the number of the winning player."""
+        return self._result
+
+    def code(self, ply):
+        """:param: move number, starting at 1
+        :returns: action code of that move, found without reading the moves before it."""
+        index = ply - 1
+        offset = self._body + index * self._width
+        if self._interval:
+            offset += (index // self._interval) * self._snapshot_length
+        if self._width == 1:
+            return self._data[offset]
+        return struct.unpack_from(">H", self._data, offset)[0]
+
+    def actions(self):
+        """Yields the game's action tuples in order. Raises ValueError at a code that is not an action."""
+        for ply in range(1, self._plies + 1):
+            action = code_action(self.code(ply), self._size)
+            if action is None:
+                raise ValueError("move %d is not a valid action code" % ply)
+            yield action
+
+    def replay(self):
+        """Replays the whole game through the rules, checking every move, snapshot and the result.
+        :returns: QuoridorGame at the end of the game. Raises ValueError if the record breaks the rules."""
+        game = QuoridorGame(self._size, self._fences)
+        for ply, action in enumerate(self.actions(), 1):
+            if game.apply(action) is not True:
+                raise ValueError("move %d is not legal: %r" % (ply, action))
+            if self._interval and ply % self._interval == 0:
+                if self._snapshot(ply // self._interval).get_state() != game.get_state():
+                    raise ValueError("snapshot after move %d does not match the game" % ply)
+        if game.get_winner() != self._result:
+            raise ValueError("recorded result does not match the game")
+        return game
+
+    def position_at(self, ply):
+        """Rebuilds the position after ply moves from the nearest snapshot before it.
+        :param: number of moves played, from 0 to get_plies()
+        :returns: QuoridorGame. Raises ValueError if ply is out of range or a move is not legal."""
+        if not 0 <= ply <= self._plies:
+            raise ValueError("game has %d moves" % self._plies)
+        start = 0
+        if self._interval and ply >= self._interval:
+            start = ply - ply % self._interval
+            game = self._snapshot(start // self._interval)
+        else:
+            game = QuoridorGame(self._size, self._fences)
+        for number in range(start + 1, ply + 1):
+            action = code_action(self.code(number), self._size)
+            if action is None or game.apply(action) is not True:
+                raise ValueError("move %d is not legal: %r" % (number, action))
+        return game
+
+    def _snapshot(self, number):
+        """:returns: QuoridorGame from the number-th snapshot, taken after number * interval moves."""
+        ply = number * self._interval
+        offset = self._body + ply * self._width + (number - 1) * self._snapshot_length
+        if self._width == 1:
+            marker = self._data[offset]
+        else:
+            marker = struct.unpack_from(">H", self._data, offset)[0]
+        if marker != snapshot_marker(self._size):
+            raise ValueError("snapshot after move %d is missing" % ply)
+        return decode_position(self._data, offset + self._width)
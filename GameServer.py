@@ -0,0 +1,319 @@
+"""Asyncio server hosting many QuoridorGame sessions in one process.
+
+Clients connect over TCP and send one JSON request per line; the server answers each request with one JSON line
+carrying the same "id". Requests:
+    {"id": 1, "op": "new"}                                        starts a game, answer has its "game" id;
+                                                                  optional "size" (up to the server's max_size)
+                                                                  and "fences" pick a variant
+    {"id": 2, "op": "move", "game": 7, "player": 1, "coordinate": [4, 1]}
+    {"id": 3, "op": "fence", "game": 7, "player": 1, "direction": "h", "coordinate": [6, 5]}
+    {"id": 4, "op": "state", "game": 7}
+    {"id": 5, "op": "subscribe", "game": 7}                       also "unsubscribe"
+    {"id": 6, "op": "end", "game": 7}                             removes the game
+Move and fence answers carry "result", the value move_pawn or place_fence returned. Subscribed connections also get
+{"update": state} lines after every successful move; updates are batched per connection and only the newest state
+of each game is sent, so a slow client never holds up a game.
+
+Requests for one game are handled one at a time, in the order they arrive, under the game's lock, so get_turn()
+checks stay correct however many clients share a game. Each connection has a bounded queue of answers: when a
+client stops reading, the server stops reading its requests too, which pushes back on the client through TCP. When
+writing to a client fails, its connection is closed and its requests stop being handled.
+Hosted games keep no undo records, since moves are never taken back. Games idle for longer than idle_seconds are
+kept only as a GameRecord position encoding (about 30 bytes) and rebuilt on their next request. Games are built and
+played on the event loop, and the work per move grows with the board's area, so board sizes are capped by
+max_size (19 by default) to keep one client's games from holding up everyone else's.
+
+Example:
+    python GameServer.py --port 8765"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+from GameRecord import MAX_FENCES, MAX_POSITION_SIZE, decode_position, encode_position
+from Quoridor import BOARD_SIZE, FENCES, MoveTables, QuoridorGame
+
+
+class Session:
+    """One hosted game, either live as a QuoridorGame or evicted to its encoded position."""
+
+    def __init__(self, game_id, size=BOARD_SIZE, fences=FENCES):
+        """Initializes session with a new game."""
+        self.game_id = game_id
+        self.game = QuoridorGame(size, fences)
+        self.game.set_undo_limit(0)  # moves are never taken back, so keep no undo records
+        self.encoded = None  # encoded position while evicted
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.subscribers = set()
+
+    def get_game(self):
+        """:returns: the live game, rebuilding it first if it was evicted."""
+        if self.game is None:
+            self.game = decode_position(self.encoded)
+            self.game.set_undo_limit(0)
+            self.encoded = None
+        self.last_used = time.monotonic()
+        return self.game
+
+    def evict(self):
+        """Replaces the live game with its encoded position."""
+        self.encoded = encode_position(self.game)
+        self.game = None
+
+
+class Connection:
+    """One client connection. Answers wait in a bounded queue; state updates are kept per game, newest only, and
+    both are written out together by a single writer task."""
+
+    def __init__(self, writer, max_pending):
+        """Initializes connection around an asyncio StreamWriter."""
+        self._writer = writer
+        self._answers = asyncio.Queue(max_pending)
+        self._updates = {}  # game id to newest state not yet sent
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.ensure_future(self._write_loop())
+
+    async def answer(self, message):
+        """Queues an answer, waiting while the queue is full.
+        :returns: None, raises ConnectionResetError if the writer stopped, since nothing queued would be sent."""
+        if self._task.done():
+            raise ConnectionResetError("connection is closed")
+        if self._answers.full():
+            put = asyncio.ensure_future(self._answers.put(message))
+            try:
+                await asyncio.wait((put, self._task), return_when=asyncio.FIRST_COMPLETED)  # writer may die meanwhile
+            finally:
+                put.cancel()  # does nothing once the answer is queued
+            if put.cancelled():
+                raise ConnectionResetError("connection is closed")
+        else:
+            self._answers.put_nowait(message)
+        self._wake.set()
+
+    def update(self, game_id, state):
+        """Queues a state update, replacing any update for the same game that has not been sent yet."""
+        self._updates[game_id] = state
+        self._wake.set()
+
+    async def close(self):
+        """Sends what is queued and closes the connection."""
+        self._closing = True
+        self._wake.set()
+        try:
+            await self._task
+        except (asyncio.CancelledError, ConnectionError):
+            pass  # client went away or the server is shutting down
+        self._writer.close()
+
+    async def _write_loop(self):
+        """Writes queued answers and updates in batches, waiting for the socket to drain between batches. If the
+        socket fails, the connection is closed, which also ends the reading side."""
+        try:
+            while True:
+                await self._wake.wait()
+                self._wake.clear()
+                lines = []
+                while not self._answers.empty():
+                    lines.append(json.dumps(self._answers.get_nowait()))
+                updates, self._updates = self._updates, {}
+                for state in updates.values():
+                    lines.append(json.dumps({"update": state}))
+                if lines:
+                    self._writer.write(("\n".join(lines) + "\n").encode())
+                    await self._writer.drain()
+                if self._closing and self._answers.empty() and not self._updates:
+                    break
+        except ConnectionError:
+            self._closing = True
+            self._writer.close()
+            raise
+
+
+class GameServer:
+    """Hosts game sessions for any number of client connections. See the module docstring for the protocol."""
+
+    def __init__(self, host="127.0.0.1", port=0, idle_seconds=60.0, max_games=100000, max_pending=256,
+                 max_size=19):
+        """Initializes server.
+        :param: address to listen on, port (0 picks a free one), seconds before an idle game is evicted, most games
+        hosted at once, most answers queued per connection before its requests stop being read, largest board size
+        clients may ask for (at most 255, the largest a position encoding holds)."""
+        if not 2 <= max_size <= MAX_POSITION_SIZE:
+            raise ValueError("max_size must be from 2 to %d" % MAX_POSITION_SIZE)
+        self._host = host
+        self._port = port
+        self._idle_seconds = idle_seconds
+        self._max_games = max_games
+        self._max_pending = max_pending
+        self._max_size = max_size
+        self._sessions = {}
+        self._clients = set()  # tasks reading from each connected client
+        self._ids = itertools.count(1)
+        self._server = None
+        self._evictor = None
+
+    async def start(self):
+        """Starts listening.
+        :returns: (host, port) the server listens on."""
+        self._server = await asyncio.start_server(self._handle_client, self._host, self._port)
+        self._evictor = asyncio.ensure_future(self._evict_loop())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        """Starts the server if needed and serves until cancelled."""
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        """Stops listening, stops evicting games and closes every client connection."""
+        if self._evictor is not None:
+            self._evictor.cancel()
+        if self._server is not None:
+            self._server.close()
+        clients = list(self._clients)
+        for client in clients:
+            client.cancel()
+        await asyncio.gather(*clients, return_exceptions=True)  # each closes its connection as it stops
+        if self._evictor is not None:
+            await asyncio.gather(self._evictor, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    def get_stats(self):
+        """:returns: dictionary with the number of games hosted and how many are live in memory."""
+        live = sum(1 for session in self._sessions.values() if session.game is not None)
+        return {"games": len(self._sessions), "live": live, "evicted": len(self._sessions) - live}
+
+    def evict_idle(self, idle_seconds=None):
+        """Evicts every game unused for idle_seconds (default: the server's setting) and not busy with a request.
+        :returns: number of games evicted."""
+        if idle_seconds is None:
+            idle_seconds = self._idle_seconds
+        cutoff = time.monotonic() - idle_seconds
+        count = 0
+        for session in self._sessions.values():
+            if session.game is not None and session.last_used <= cutoff and not session.lock.locked():
+                session.evict()
+                count += 1
+        return count
+
+    async def _evict_loop(self):
+        """Evicts idle games every few seconds."""
+        while True:
+            await asyncio.sleep(max(0.05, self._idle_seconds / 4))
+            self.evict_idle()
+
+    async def _handle_client(self, reader, writer):
+        """Reads requests from one client until it disconnects or the server closes, answering each in order."""
+        task = asyncio.current_task()
+        self._clients.add(task)
+        connection = Connection(writer, self._max_pending)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = {}
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                    answer = await self._handle_request(request, connection)
+                except (ValueError, TypeError, KeyError) as error:
+                    answer = {"ok": False, "error": "bad request: " + str(error)}
+                answer["id"] = request.get("id") if isinstance(request, dict) else None
+                await connection.answer(answer)  # waits here while the client is not reading its answers
+        except (ConnectionError, asyncio.CancelledError):
+            pass  # client went away, or close() cancelled this task: end normally, asyncio reports a cancelled one
+        finally:
+            for session in self._sessions.values():
+                session.subscribers.discard(connection)
+            await connection.close()
+            self._clients.discard(task)
+
+    async def _handle_request(self, request, connection):
+        """:returns: answer dictionary for one request."""
+        request_type = request.get("op")
+        if request_type == "new":
+            if len(self._sessions) >= self._max_games:
+                return {"ok": False, "error": "server is full"}
+            size, fences = int(request.get("size", BOARD_SIZE)), int(request.get("fences", FENCES))
+            if not 2 <= size <= self._max_size or not 0 <= fences <= MAX_FENCES:
+                return {"ok": False, "error": "size must be from 2 to %d and fences from 0 to %d" % (
+                    self._max_size, MAX_FENCES)}
+            session = Session(next(self._ids), size, fences)
+            self._sessions[session.game_id] = session
+            return {"ok": True, "game": session.game_id, "state": describe(session.game_id, session.get_game())}
+
+        session = self._sessions.get(request.get("game"))
+        if session is None:
+            return {"ok": False, "error": "no such game"}
+        async with session.lock:  # one request at a time per game, in arrival order
+            if self._sessions.get(session.game_id) is not session:
+                return {"ok": False, "error": "no such game"}  # ended while this request waited
+            game = session.get_game()
+            if request_type in ("move", "fence"):
+                player = request["player"]
+                if type(player) is not int or player not in (1, 2):
+                    return {"ok": False, "error": "player must be 1 or 2"}  # JSON true would pass for 1
+                coordinate = tuple(request["coordinate"])
+                if request_type == "move":
+                    result = game.move_pawn(player, coordinate)
+                else:
+                    result = game.place_fence(player, request["direction"], coordinate)
+                state = describe(session.game_id, game)
+                if result is True:
+                    for subscriber in session.subscribers:
+                        subscriber.update(session.game_id, state)
+                return {"ok": True, "result": result, "state": state}
+            elif request_type == "state":
+                return {"ok": True, "state": describe(session.game_id, game)}
+            elif request_type == "subscribe":
+                session.subscribers.add(connection)
+                return {"ok": True, "state": describe(session.game_id, game)}
+            elif request_type == "unsubscribe":
+                session.subscribers.discard(connection)
+                return {"ok": True}
+            elif request_type == "end":
+                del self._sessions[session.game_id]
+                return {"ok": True}
+        return {"ok": False, "error": "unknown op"}
+
+
+def describe(game_id, game):
+    """:returns: JSON-ready dictionary of a game's state, listing placed fences without the outer ones."""
+    position_one, position_two, fences_one, fences_two, horizontal, vertical, turn, status = game.get_state()
+    tables = MoveTables.for_size(game.get_size())
+    fences = {"h": [], "v": []}
+    for fence_direction, mask in (("h", horizontal & ~tables.top_row), ("v", vertical & ~tables.left_column)):
+        while mask:
+            low = mask & -mask
+            fences[fence_direction].append(list(tables.coordinates[low.bit_length() - 1]))
+            mask ^= low
+    return {"game": game_id, "turn": turn, "status": status, "positions": [list(position_one), list(position_two)],
+            "fences_left": [fences_one, fences_two], "fences": fences}
+
+
+def main(argv=None):
+    """Runs the command line entry point.
+    :param: argument list, or None to use sys.argv"""
+    parser = argparse.ArgumentParser(description="Host Quoridor games over TCP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("--idle-seconds", type=float, default=60.0, help="seconds before an idle game is evicted")
+    parser.add_argument("--max-size", type=int, default=19, help="largest board size clients may ask for")
+    args = parser.parse_args(argv)
+    server = GameServer(args.host, args.port, args.idle_seconds, max_size=args.max_size)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
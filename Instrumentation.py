@@ -0,0 +1,221 @@
+"""Opt-in counters and timings for the rules engine, for finding where the time goes when moves get slow.
+
+enable(game) switches one game to a subclass of its class whose methods count their calls and add up their time,
+and does the same for the game's PathFinder so every breadth-first search is counted with the number of squares it
+reached and how deep it went. Games that are not enabled run the original classes, so instrumentation costs nothing
+until it is switched on. Timings include the time spent in instrumented methods called from inside, so
+legal_actions includes the fence checks it makes.
+
+Example:
+    instrumentation = Instrumentation.enable(game)
+    ... play ...
+    print(json.dumps(game.get_instrumentation().snapshot()))
+    Instrumentation.disable(game)
+
+An instrumented game pickles and copies as a plain game without its counters."""
+
+import time
+
+from Quoridor import PathFinder
+
+DEFAULT_METHODS = ("move_pawn", "place_fence", "validate_pawn_move", "validate_fence_placement", "fair_play_rule",
+                   "move_direction", "is_adjacent", "is_adjacent_plus_1", "is_pawn_jump", "check_fence_block",
+                   "legal_pawn_moves", "legal_fence_placements", "legal_actions", "path_blocking_fences", "apply",
+                   "undo")
+
+
+class Instrumentation:
+    """Counters collected for one game: calls and total nanoseconds per method, breadth-first searches run by the
+    fair play check with the squares they reached, and a histogram of search depth per fence placement. The depth
+    of a placement is the deepest search it ran, 0 when both distance maps were kept without a search."""
+
+    def __init__(self):
+        """Initializes empty counters."""
+        self._calls = {}
+        self._nanoseconds = {}
+        self._searches = 0
+        self._nodes = 0
+        self._depths = {}
+        self._placement_depth = None  # deepest search so far in the fence placement under way, or None
+
+    def reset(self):
+        """Sets every counter back to zero."""
+        self.__init__()
+
+    def get_calls(self):
+        """:returns: dictionary of method name to number of calls."""
+        return dict(self._calls)
+
+    def get_timings(self):
+        """:returns: dictionary of method name to total time spent in it, in seconds."""
+        return {name: nanoseconds / 1e9 for name, nanoseconds in self._nanoseconds.items()}
+
+    def get_searches(self):
+        """:returns: number of breadth-first searches run to rebuild distance maps."""
+        return self._searches
+
+    def get_nodes(self):
+        """:returns: squares reached by all breadth-first searches together."""
+        return self._nodes
+
+    def get_depth_histogram(self):
+        """:returns: dictionary of search depth to number of fence placements with that depth."""
+        return dict(self._depths)
+
+    def snapshot(self):
+        """:returns: JSON-ready dictionary of every counter, for exporting to a metrics system."""
+        return {"calls": self.get_calls(), "seconds": self.get_timings(),
+                "fair_play": {"searches": self._searches, "nodes": self._nodes},
+                "placement_depth_histogram": {str(depth): count for depth, count in sorted(self._depths.items())}}
+
+    def record_call(self, name, nanoseconds):
+        """Adds one call of a method taking nanoseconds."""
+        self._calls[name] = self._calls.get(name, 0) + 1
+        self._nanoseconds[name] = self._nanoseconds.get(name, 0) + nanoseconds
+
+    def record_search(self, nodes, depth):
+        """Adds one breadth-first search that reached nodes squares, depth moves from the goal row at most."""
+        self._searches += 1
+        self._nodes += nodes
+        if self._placement_depth is not None and depth > self._placement_depth:
+            self._placement_depth = depth
+
+    def start_placement(self):
+        """Marks the start of a fence placement, so the searches that follow count towards its depth."""
+        self._placement_depth = 0
+
+    def end_placement(self):
+        """Adds the fence placement started by start_placement() to the depth histogram."""
+        depth = self._placement_depth
+        self._placement_depth = None
+        self._depths[depth] = self._depths.get(depth, 0) + 1
+
+
+_classes = {}  # instrumented subclass by (original class, method names)
+
+
+def enable(game, methods=DEFAULT_METHODS):
+    """Starts collecting counters for a game. Calling it again keeps the counters already collected.
+    :param: QuoridorGame, names of the methods to count and time
+    :returns: the game's Instrumentation."""
+    instrumentation = game.get_instrumentation()
+    if instrumentation is None:
+        instrumentation = Instrumentation()
+    disable(game)
+    game._instrumentation = instrumentation
+    game.__class__ = _instrumented_class(game.__class__, tuple(methods))
+    _enable_path_finder(game)
+    return instrumentation
+
+
+def disable(game):
+    """Stops collecting counters for a game and puts back its original classes. The game's counters are dropped.
+    :returns: the Instrumentation the game had, or None."""
+    instrumentation = game.get_instrumentation()
+    game.__class__ = getattr(game.__class__, "_original_class", game.__class__)
+    path_finder = game.get_path_finder()
+    if isinstance(path_finder, _InstrumentedPathFinder):
+        del path_finder._instrumentation
+        path_finder.__class__ = PathFinder
+    game._instrumentation = None
+    return instrumentation
+
+
+def _enable_path_finder(game):
+    """Switches the game's current PathFinder to the counting subclass."""
+    path_finder = game.get_path_finder()
+    if type(path_finder) is PathFinder:
+        path_finder.__class__ = _InstrumentedPathFinder
+    path_finder._instrumentation = game.get_instrumentation()
+
+
+def _restore(original_class, state):
+    """Rebuilds a plain object of original_class from state. Used to pickle and copy instrumented objects."""
+    restored = original_class.__new__(original_class)
+    for name, value in state.items():
+        setattr(restored, name, value)
+    return restored
+
+
+def _instrumented_class(original_class, methods):
+    """:returns: subclass of original_class whose listed methods record their calls, built once per class."""
+    if (original_class, methods) in _classes:
+        return _classes[(original_class, methods)]
+    namespace = {"__slots__": (), "_original_class": original_class}  # same layout, so __class__ can be swapped
+    for name in methods:
+        if name == "place_fence":
+            namespace[name] = _timed_placement(getattr(original_class, name))
+        else:
+            namespace[name] = _timed(name, getattr(original_class, name))
+    namespace["set_state"] = _reinstrumenting(original_class.set_state)
+
+    def __reduce_ex__(self, protocol):
+        return _restore, (original_class, self.__getstate__())
+
+    namespace["__reduce_ex__"] = __reduce_ex__
+    subclass = type("Instrumented" + original_class.__name__, (original_class,), namespace)
+    _classes[(original_class, methods)] = subclass
+    return subclass
+
+
+def _timed(name, method):
+    """:returns: function calling method and recording its call and time."""
+    clock = time.perf_counter_ns
+
+    def timed(self, *args, **kwargs):
+        start = clock()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._instrumentation.record_call(name, clock() - start)
+
+    timed.__name__ = name
+    timed.__doc__ = method.__doc__
+    return timed
+
+
+def _timed_placement(method):
+    """:returns: function calling place_fence, recording its call and time and the depth of its searches."""
+    clock = time.perf_counter_ns
+
+    def place_fence(self, *args, **kwargs):
+        instrumentation = self._instrumentation
+        instrumentation.start_placement()
+        start = clock()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            instrumentation.record_call("place_fence", clock() - start)
+            instrumentation.end_placement()
+
+    place_fence.__doc__ = method.__doc__
+    return place_fence
+
+
+def _reinstrumenting(method):
+    """:returns: function calling set_state and then counting the new PathFinder it builds."""
+
+    def set_state(self, state):
+        result = method(self, state)
+        _enable_path_finder(self)
+        return result
+
+    set_state.__doc__ = method.__doc__
+    return set_state
+
+
+class _InstrumentedPathFinder(PathFinder):
+    """PathFinder that reports every breadth-first search to its game's Instrumentation."""
+
+    __slots__ = ()
+
+    def build(self, player):
+        """Runs PathFinder.build() and records the squares it reached and its depth."""
+        distances = PathFinder.build(self, player)
+        reached = [distance for distance in distances if distance != self.UNREACHABLE]
+        self._instrumentation.record_search(len(reached), max(reached, default=0))
+        return distances
+
+    def __reduce_ex__(self, protocol):
+        state = {name: getattr(self, name) for name in ("_board", "_distances")}
+        return _restore, (PathFinder, state)
@@ -0,0 +1,215 @@
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+class Node:
+    """One position in a Monte Carlo search tree. Wins are counted for the player who made the move leading to the
+    node, so a parent picks the child with the best win rate for itself."""
+
+    def __init__(self, action, player, actions):
+        """Initializes node.
+        :param: action that led here (None for the root), player who made it, actions still to try from here."""
+        self.action = action
+        self.player = player
+        self.untried = actions
+        self.children = []
+        self.visits = 0
+        self.wins = 0.0
+
+    def select_child(self, exploration):
+        """:returns: child with the highest UCT score."""
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.wins / child.visits +
+                   exploration * math.sqrt(log_visits / child.visits))
+
+
+class MCTS:
+    """Monte Carlo Tree Search player for QuoridorGame, an alternative to the alpha-beta Engine. Playouts are spread
+    over a process pool with root parallelization: every worker grows its own tree from the current position with
+    its own random seed, and the root visit counts of all trees are added up to pick the move. Workers share nothing
+    while searching, so the search scales with the number of cores.
+
+    Trees only branch on pawn moves and on fences that cut the opponent's shortest path, like Engine, or on every
+    legal fence when the pawn is boxed in and none of those is legal. Playouts mostly walk the shortest path,
+    sometimes place a blocking fence or make a random pawn move, and are scored by comparing path lengths if nobody
+    has won after max_playout_moves moves.
+
+    The pool is started on the first search and kept for later ones; call close() or use the player as a context
+    manager to shut it down. With one worker the search runs in the calling process."""
+
+    def __init__(self, playouts=2000, time_limit_ms=1000, workers=None, exploration=1.4, max_playout_moves=60,
+                 seed=None):
+        """Initializes player.
+        :param: most playouts per move over all workers (None for no limit), time budget per move in milliseconds
+        (None for no limit), number of worker processes (None for one per core), UCT exploration constant, moves
+        before a playout is scored by path lengths, random seed (None for a random one)."""
+        self._playouts = playouts
+        self._time_limit_ms = time_limit_ms
+        self._workers = workers or os.cpu_count() or 1
+        self._exploration = exploration
+        self._max_playout_moves = max_playout_moves
+        self._random = random.Random(seed)
+        self._pool = None
+        self._search_info = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shuts down the worker pool, if one was started."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def get_search_info(self):
+        """:returns: dictionary describing the last search: playouts run, workers used and time taken in
+        milliseconds."""
+        return self._search_info
+
+    def choose_move(self, game):
+        """Picks a move for the player whose turn it is.
+        :param: QuoridorGame
+        :returns: action tuple for QuoridorGame.apply(), or None if the game is already won."""
+        if game.get_status() != "IN PROGRESS":
+            return None
+        start = time.perf_counter()
+        deadline = None
+        if self._time_limit_ms is not None:
+            deadline = time.time() + self._time_limit_ms / 1000  # wall clock, so worker processes agree on it
+        playouts = None
+        if self._playouts is not None:
+            playouts = max(1, math.ceil(self._playouts / self._workers))
+        jobs = [(game, playouts, deadline, self._exploration, self._max_playout_moves, self._random.getrandbits(64))
+                for _ in range(self._workers)]
+
+        if self._workers == 1:
+            results = [run_search(jobs[0])]
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self._workers)
+            results = list(self._pool.map(run_search, jobs))
+
+        visits = {}
+        total = 0
+        for root_visits, count in results:
+            total += count
+            for action, action_visits in root_visits.items():
+                visits[action] = visits.get(action, 0) + action_visits
+        self._search_info = {"playouts": total, "workers": self._workers,
+                             "time_ms": (time.perf_counter() - start) * 1000}
+        if not visits:
+            return None
+        return max(visits, key=visits.get)
+
+
+def candidate_actions(game):
+    """:returns: the actions a tree node branches on: pawn moves and fences that cut the opponent's shortest
+    path, or every legal action if there are none of those."""
+    player = game.get_turn()
+    actions = [("move", coordinate) for coordinate in game.legal_pawn_moves(player)]
+    actions.extend(game.path_blocking_fences(3 - player))
+    if not actions:
+        actions = game.legal_actions()  # boxed in pawn, any fence will do
+    return actions
+
+
+def run_search(job):
+    """Grows one search tree. Runs in a worker process, so it takes and returns plain picklable values.
+    :param: (game, most playouts or None, wall clock deadline or None, exploration constant, playout move limit,
+    random seed)
+    :returns: (dictionary of root action to visit count, number of playouts run)."""
+    game, playouts, deadline, exploration, max_playout_moves, seed = job
+    previous_limit = game.get_undo_limit()
+    game.set_undo_limit(None)  # every playout move is taken back
+    try:
+        return grow_tree(game, playouts, deadline, exploration, max_playout_moves, random.Random(seed))
+    finally:
+        game.set_undo_limit(previous_limit)
+
+
+def grow_tree(game, playouts, deadline, exploration, max_playout_moves, generator):
+    """Runs playouts from the game's position until the playout count or the deadline is reached.
+    :returns: (dictionary of root action to visit count, number of playouts run)."""
+    root = Node(None, 3 - game.get_turn(), candidate_actions(game))
+    count = 0
+    while (playouts is None or count < playouts) and (deadline is None or time.time() < deadline):
+        node = root
+        path = [root]
+        applied = 0
+
+        while not node.untried and node.children:  # selection
+            node = node.select_child(exploration)
+            game.apply(node.action)
+            applied += 1
+            path.append(node)
+
+        if node.untried and game.get_status() == "IN PROGRESS":  # expansion
+            action = node.untried.pop(generator.randrange(len(node.untried)))
+            player = game.get_turn()
+            game.apply(action)
+            applied += 1
+            node = Node(action, player, candidate_actions(game))
+            path[-1].children.append(node)
+            path.append(node)
+
+        winner = playout(game, generator, max_playout_moves)
+        for visited in path:  # backpropagation
+            visited.visits += 1
+            if winner == visited.player:
+                visited.wins += 1
+            elif winner is None:
+                visited.wins += 0.5
+        for _ in range(applied):
+            game.undo()
+        count += 1
+    return {child.action: child.visits for child in root.children}, count
+
+
+def playout(game, generator, max_moves):
+    """Plays quick moves from the current position and takes them back afterwards.
+    :returns: number of the winning player, the player with the shorter path if nobody won within max_moves moves,
+    or None if the paths are the same length."""
+    applied = 0
+    while game.get_status() == "IN PROGRESS" and applied < max_moves:
+        player = game.get_turn()
+        roll = generator.random()
+        action = None
+        if roll < 0.15 and game.check_player(player).get_fences() > 0:
+            fences = game.path_blocking_fences(3 - player)
+            if fences:
+                action = generator.choice(fences)
+        if action is None:
+            moves = game.legal_pawn_moves(player)
+            if moves:
+                if roll < 0.85:
+                    coordinate = min(moves, key=lambda move: game.distance_to_goal(player, move))
+                else:
+                    coordinate = generator.choice(moves)
+                action = ("move", coordinate)
+            else:
+                actions = game.legal_actions()  # boxed in pawn, any fence will do
+                if not actions:
+                    break
+                action = generator.choice(actions)
+        game.apply(action)
+        applied += 1
+
+    winner = game.get_winner()
+    if winner == 0:
+        lengths = {player: game.shortest_path_length(player) for player in (1, 2)}
+        lengths[game.get_turn()] -= 0.5  # moving first is worth half a move
+        if lengths[1] < lengths[2]:
+            winner = 1
+        elif lengths[2] < lengths[1]:
+            winner = 2
+        else:
+            winner = None
+    for _ in range(applied):
+        game.undo()
+    return winner
@@ -1,3 +1,19 @@
+import random
+from array import array
+from collections.abc import Mapping
+
+BOARD_SIZE = 9  # squares along each side of the standard board
+FENCES = 10  # fences each player starts with in the standard game
+UP, DOWN, LEFT, RIGHT = 0, 1, 2, 3  # directions used to index the bitboard masks
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+SIDESTEPS = {UP: (LEFT, RIGHT), DOWN: (LEFT, RIGHT), LEFT: (UP, DOWN), RIGHT: (UP, DOWN)}  # diagonal jump sides
+STEPS = {(0, -1): (UP, 1), (0, 1): (DOWN, 1), (-1, 0): (LEFT, 1), (1, 0): (RIGHT, 1),
+         (0, -2): (UP, 2), (0, 2): (DOWN, 2), (-2, 0): (LEFT, 2), (2, 0): (RIGHT, 2)}  # (dx, dy): (direction, length)
+DIAGONALS = {(-1, -1): (LEFT, UP), (1, -1): (RIGHT, UP), (-1, 1): (LEFT, DOWN), (1, 1): (RIGHT, DOWN)}
+# STEPS and DIAGONALS keyed by (dx + 2) * 5 + dy + 2 instead of a tuple, so looking up a move builds no tuple
+STEP_CODES = {(dx + 2) * 5 + dy + 2: step for (dx, dy), step in STEPS.items()}
+DIAGONAL_CODES = {(dx + 2) * 5 + dy + 2: corner for (dx, dy), corner in DIAGONALS.items()}
+
 
 class QuoridorGame:
     """
@@ -8,29 +24,51 @@ class QuoridorGame:
     class interacts with the Player class because the player class contains data that is specific to each player:
     mainly the number of fences left to play, and the current position of the player on the board. This makes it more
     streamlined to implement certain methods.
+
+    The board is 9x9 with 10 fences per player unless other values are passed in. Pawns start in the middle of
+    the first and last rows, and lookup tables, goal rows and path searches all follow the board size.
+
+    Games use __slots__, keep squares as integers and share the distance maps of the empty board, so a new game takes
+    about 800 bytes. Each successful move also pushes an undo record, about 150 bytes for a pawn move and about 400
+    for a fence on the 9x9 board, since a fence record keeps any distance map the fence replaced. The records are kept
+    until undo() takes them back; set_undo_limit() keeps only the newest, or none for games that are never taken
+    back.
     """
 
-    def __init__(self):
-        """Initializes QuoridorGame object."""
-        self._player_one = Player(1)
-        self._player_two = Player(2)
-        self._board = {}  # stores board
-        for x in range(9):
-            for y in range(9):
-                self._board[(x, y)] = []  # generates board coordinates
-                if x == 0:
-                    self._board[(x, y)].append(
-                        "v")  # places fence on leftmost side of board (prevents accidental fence placement)
-                if y == 0:
-                    self._board[(x, y)].append(
-                        "h")  # places fences on topmost side of board (prevents accidental fence placement)
-                if x == 4 and y == 0:
-                    self._board[(x, y)].append("P1")  # initializes player one start space
-                if x == 4 and y == 8:
-                    self._board[(x, y)].append("P2")  # initializes player two start space
+    __slots__ = ("_player_one", "_player_two", "_board", "_path_finder", "_turn", "_status", "_undo_stack",
+                 "_undo_limit", "_zobrist", "_key", "_table", "_instrumentation")
 
+    def __init__(self, size=BOARD_SIZE, fences=FENCES):
+        """Initializes QuoridorGame object.
+        :param: squares along each side of the board (at least 2), fences each player starts with"""
+        if size < 2 or fences < 0:
+            raise ValueError("board needs at least 2 squares per side and fences cannot be negative")
+        self._player_one = Player(1, size, fences)
+        self._player_two = Player(2, size, fences)
+        self._board = Board(size)  # stores fences as bitmasks
+        self._board.set_players(self._player_one, self._player_two)  # pawn squares are read from the players
+        self._path_finder = PathFinder(self._board)  # caches each player's distance to the other side
         self._turn = 1  # initializes first turn to player one
         self._status = "IN PROGRESS"  # "IN PROGRESS", "PLAYER ONE WINS", "PLAYER TWO WINS"
+        self._undo_stack = []  # one record per successful move, newest last, used by undo()
+        self._undo_limit = None  # most undo records kept, None for no limit
+        self._zobrist = ZobristKeys.for_size(self._board.get_size())
+        self._key = self._compute_key()  # Zobrist key without the pawns, whose keys are added from their squares
+        self._table = None  # optional TranspositionTable for fair play results
+        self._instrumentation = None  # Instrumentation while enabled, see Instrumentation.enable()
+
+    def __getstate__(self):
+        """Pickles the game without its transposition table, which is a cache and can be large, or its
+        instrumentation, which belongs to this process."""
+        state = {name: getattr(self, name) for name in QuoridorGame.__slots__}
+        state["_table"] = None
+        state["_instrumentation"] = None
+        return state
+
+    def __setstate__(self, state):
+        """Restores a game pickled by __getstate__()."""
+        for name, value in state.items():
+            setattr(self, name, value)
 
     def get_player_one(self):
         """:returns: player one object."""
@@ -48,12 +86,103 @@ class QuoridorGame:
         """:returns: whether game is in progress or has been won."""
         return self._status
 
+    def get_winner(self):
+        """:returns: number of the player who has won, or 0 while the game is in progress."""
+        if self._status == "PLAYER 1 WINS":
+            return 1
+        elif self._status == "PLAYER 2 WINS":
+            return 2
+        return 0
+
+    def get_size(self):
+        """:returns: number of squares along each side of the board."""
+        return self._board.get_size()
+
     def get_board(self):
-        """:returns: the current status of the board, including player and fence locations."""
-        return self._board
+        """:returns: the current status of the board, including player and fence locations, as a read-only
+        mapping of coordinate tuple to a list such as ["v", "h", "P1"]. Lists are built on access."""
+        return self._board.view()
+
+    def get_path_finder(self):
+        """:returns: the PathFinder holding each player's distance-to-goal map."""
+        return self._path_finder
+
+    def get_state(self):
+        """:returns: tuple describing the position: (player one position, player two position, player one fences
+        left, player two fences left, horizontal fence bitmask, vertical fence bitmask, turn, status). A fence at
+        (x, y) is bit y * size + x of its bitmask; the outer top and left fences are included."""
+        board = self._board
+        return (self._player_one.get_player_position(), self._player_two.get_player_position(),
+                self._player_one.get_fences(), self._player_two.get_fences(),
+                board.get_fences("h"), board.get_fences("v"), self._turn, self._status)
+
+    def set_state(self, state):
+        """Sets up the position described by a tuple from get_state(). Clears the undo history.
+        :param: state tuple
+        :returns: None, raises ValueError if a pawn is off the board."""
+        position_one, position_two, fences_one, fences_two, horizontal, vertical, turn, status = state
+        board = self._board
+        square_one, square_two = board.index(position_one), board.index(position_two)
+        if square_one is None or square_two is None:
+            raise ValueError("pawn position is not on the board")
+        board.set_fences(horizontal, vertical)
+        self._player_one.set_square(square_one)
+        self._player_two.set_square(square_two)
+        self._player_one.set_fences(fences_one)
+        self._player_two.set_fences(fences_two)
+        self._path_finder = PathFinder(board)
+        self._turn = turn
+        self._status = status
+        self._undo_stack = []
+        self._key = self._compute_key()
+
+    def _compute_key(self):
+        """:returns: Zobrist key of the current position leaving out the pawns, worked out from scratch."""
+        board = self._board
+        zobrist = self._zobrist
+        key = zobrist.fence_count(1, self._player_one.get_fences()) ^ \
+            zobrist.fence_count(2, self._player_two.get_fences())
+        for fence_direction, square in board.get_tables().fence_slots:
+            if board.has_fence(fence_direction, square):
+                key ^= zobrist.fences[fence_direction][square]
+        if self._turn == 2:
+            key ^= zobrist.turn
+        return key
+
+    def get_zobrist_key(self):
+        """:returns: 64 bit Zobrist key of the position: pawn squares, fences, fences left and whose turn it is.
+        Equal positions have equal keys however they were reached."""
+        zobrist = self._zobrist
+        return self._key ^ zobrist.pawn[1][self._player_one.get_square()] ^ \
+            zobrist.pawn[2][self._player_two.get_square()]  # pawn keys follow the players' squares
+
+    def get_transposition_table(self):
+        """:returns: the TranspositionTable used to cache fair play results, or None."""
+        return self._table
+
+    def get_instrumentation(self):
+        """:returns: the Instrumentation collecting counters and timings for this game, or None when it is off."""
+        return self._instrumentation
+
+    def get_undo_limit(self):
+        """:returns: most undo records the game keeps, or None if it keeps every one."""
+        return self._undo_limit
+
+    def set_undo_limit(self, limit):
+        """Limits how many moves undo() can take back. Older records are dropped, including ones already kept.
+        :param: most undo records to keep, 0 to keep none, or None to keep every one."""
+        self._undo_limit = limit
+        if limit is not None and len(self._undo_stack) > limit:
+            del self._undo_stack[:len(self._undo_stack) - limit]
+
+    def set_transposition_table(self, table):
+        """:param: TranspositionTable to cache fair play and path length results in, or None to stop caching."""
+        self._table = table
 
     def set_turn(self, player):  # takes integer
         """:param: integer representing which player's turn it is."""
+        if (player == 2) != (self._turn == 2):
+            self._key ^= self._zobrist.turn  # side to move changed
         self._turn = player
 
     def set_status(self, status):  # STATUS ::string:: "IN PROGRESS", "PLAYER 1 WON", "PLAYER 2 WON"
@@ -85,7 +214,7 @@ class QuoridorGame:
         :param: coordinate tuple
         :returns: True if on board
         False if not on board."""
-        if coordinate in self.get_board():
+        if self._board.index(coordinate) is not None:
             return True
         else:
             return False
@@ -95,11 +224,9 @@ class QuoridorGame:
         :param: coordinate tuple with current location,
         new coordinate tuple
         :returns: True if adjacent, else returns False"""
-        adjacent_spaces = [(old_coord[0] + 1, old_coord[1] + 1), (old_coord[0] + 1, old_coord[1] - 1),
-                           (old_coord[0] + 1, old_coord[1]), (old_coord[0], old_coord[1] + 1),
-                           (old_coord[0], old_coord[1] - 1), (old_coord[0] - 1, old_coord[1]),
-                           (old_coord[0] - 1, old_coord[1] + 1), (old_coord[0] - 1, old_coord[1] - 1)]
-        if new_coord in adjacent_spaces:
+        dx = new_coord[0] - old_coord[0]
+        dy = new_coord[1] - old_coord[1]
+        if -1 <= dx <= 1 and -1 <= dy <= 1 and (dx != 0 or dy != 0):  # one of the eight surrounding spaces
             return True
         else:
             return False
@@ -109,9 +236,9 @@ class QuoridorGame:
         :param: coordinate tuple with current location,
         new coordinate tuple
         :returns: True if adjacent+1, else returns False"""
-        adjacent_plus_1_spaces = [(old_coord[0] + 2, old_coord[1]), (old_coord[0], old_coord[1] + 2),
-                                  (old_coord[0], old_coord[1] - 2), (old_coord[0] - 2, old_coord[1])]
-        if new_coord in adjacent_plus_1_spaces:
+        dx = new_coord[0] - old_coord[0]
+        dy = new_coord[1] - old_coord[1]
+        if (dx == 0 and (dy == 2 or dy == -2)) or (dy == 0 and (dx == 2 or dx == -2)):  # two spaces in a line
             return True
         else:
             return False
@@ -161,17 +288,19 @@ class QuoridorGame:
     def is_pawn_jump(self, player, old_coord, new_coord):
         """Determines if a move is a pawn jump.
         :returns: True if a pawn jump, else returns False."""
-        opponent_object = self.get_opponent(player)
-        opponent_location = opponent_object.get_player_position()
-        opponent_direction = self.move_direction(old_coord, opponent_location)
-        move_direction = self.move_direction(old_coord, new_coord)
-        if opponent_direction == move_direction and \
-                self.is_adjacent(old_coord, opponent_location) and \
-                self.is_adjacent_plus_1(old_coord, new_coord):
-            # if opponent and move are in same direction and move is 2 spaces, and opponents are adjacent
-            if self.check_fence_block(old_coord, self.pawn_jump_coordinates_for_check_fence(old_coord, new_coord)) \
-                    is False:
-                return True  # is a valid pawn jump
+        board = self._board
+        old_square = board.index(old_coord)
+        opponent_square = board.index(self.get_opponent(player).get_player_position())
+        if old_square is None or board.index(new_coord) is None:
+            return False
+        step = STEP_CODES.get((new_coord[0] - old_coord[0] + 2) * 5 + new_coord[1] - old_coord[1] + 2)
+        if step is None or step[1] != 2:
+            return False
+        direction = step[0]
+        if opponent_square == old_square + board.get_offset(direction) and \
+                board.is_route_blocked(old_square, direction, direction) is False:
+            # if opponent is directly in the way and no fence on either side of the opponent
+            return True  # is a valid pawn jump
         else:
             return False
 
@@ -179,20 +308,25 @@ class QuoridorGame:
         """Checks to see if a fence is blocking a move.
         :param: current location tuple coordinate, new location tuple coordinate
         :returns: True if fence is blocking, else returns False."""
-        move_direction = self.move_direction(old_coord, new_coord)
-        if (move_direction == "left" and "v" in self.get_board()[old_coord]) or \
-                (move_direction == "right" and "v" in self.get_board()[(old_coord[0] + 1, old_coord[1])]) or \
-                (move_direction == "up" and "h" in self.get_board()[old_coord]) or \
-                (move_direction == "down" and "h" in self.get_board()[(old_coord[0], old_coord[1] + 1)]) or \
-                (move_direction == "diagonal up left" and "v" in self.get_board()[(old_coord[0], old_coord[1] + 1)]) or\
-                (move_direction == "diagonal up right" and "v" in self.get_board()[
-                    (old_coord[0] + 1, old_coord[1] + 1)]) or \
-                (move_direction == "diagonal down right" and "v" in self.get_board()[
-                    (old_coord[0] - 1, old_coord[1] - 1)]) or \
-                (move_direction == "diagonal down left" and "v" in self.get_board()[(old_coord[0], old_coord[1] - 1)]):
-            return True  # move blocked by fence
-        else:
-            return False  # move not blocked by fence
+        board = self._board
+        old_square = board.index(old_coord)
+        if old_square is None:
+            return False
+        dx = new_coord[0] - old_coord[0]
+        dy = new_coord[1] - old_coord[1]
+        if not -2 <= dx <= 2 or not -2 <= dy <= 2:
+            return False  # not a move a fence could block
+        offset = (dx + 2) * 5 + dy + 2
+        if offset in STEP_CODES:
+            direction, length = STEP_CODES[offset]
+            if length == 1:
+                return board.is_blocked(old_square, direction)  # single bitwise lookup
+            return board.is_route_blocked(old_square, direction, direction)
+        if offset in DIAGONAL_CODES:  # diagonal move is blocked only if both routes around the corner are blocked
+            across, along = DIAGONAL_CODES[offset]
+            return board.is_route_blocked(old_square, across, along) and \
+                board.is_route_blocked(old_square, along, across)
+        return False  # not a move a fence could block
 
     def move_pawn(self, player, coordinate):
         """ Moves the player's pawn to a valid space.
@@ -206,9 +340,11 @@ class QuoridorGame:
         opponent_object = self.get_opponent(player)
         validation = self.validate_pawn_move(player, player_object.get_player_position(), coordinate)
         if validation is True:
-            self.get_board()[player_object.get_player_position()].remove("P" + str(player))
-            self.get_board()[coordinate].append("P" + str(player))
-            player_object.set_position(coordinate)
+            square = self._board.index(coordinate)
+            if self._undo_limit != 0:
+                self._push_undo(("move", player, player_object.get_square(), None, self._turn, self._status,
+                                 self._key))
+            player_object.set_square(square)
             self.set_turn(opponent_object.get_player_number())
             if self.is_winner(player):
                 self.set_status("PLAYER " + str(player) + " WINS")
@@ -223,32 +359,16 @@ class QuoridorGame:
         If valid, returns True.
         If invalid, returns False.
         """
-        opponent_location = self.get_opponent(player).get_player_position()
-        directions = ["up", "down", "left", "right"]
-        if self.get_status() == "IN PROGRESS" and \
-                self.get_turn() == player and \
-                self.is_on_board(coordinate) and \
-                opponent_location != coordinate:
-            # if game is not won, is player's turn, coordinate on board, and opponent not on space
-            if self.is_adjacent(player_location, opponent_location):  # if players are adjacent
-                if self.is_pawn_jump(player, player_location, coordinate) is True and \
-                        self.check_fence_block(player_location,
-                            self.pawn_jump_coordinates_for_check_fence(player_location, coordinate)) \
-                        is False:  # if a pawn jump and not blocked by fence
-                    return True  # valid move
-                elif self.move_direction(player_location, coordinate) != self.move_direction(player_location, opponent_location):
-                    if self.check_fence_block(player_location, coordinate) is False:
-                        return True
-                        # if players are adjacent, no fence block, move is not location of other pawn, valid move
-                else:
-                    return False  # invalid move
-            elif self.is_adjacent(player_location, coordinate) is True and \
-                    self.check_fence_block(player_location, coordinate) is False and \
-                    self.move_direction(player_location, coordinate) in directions:
-                # is adjacent not blocked by fence, not diagonal
-                return True  # valid move
-            else:
-                return False  # invalid move
+        board = self._board
+        if self.get_status() != "IN PROGRESS" or self.get_turn() != player:
+            return False  # game is won or it is not player's turn
+        player_square = board.index(player_location)
+        new_square = board.index(coordinate)
+        opponent_square = board.get_pawn(3 - player)
+        if player_square is None or new_square is None or new_square == opponent_square:
+            return False  # coordinate off board or opponent on space
+        if board.is_pawn_move(player_square, opponent_square, new_square):
+            return True  # adjacent move, jump or diagonal step around opponent not blocked by fence
         else:
             return False  # invalid move
 
@@ -269,14 +389,24 @@ class QuoridorGame:
         player_object = self.check_player(player)
         validation = self.validate_fence_placement(player, fence_direction, coordinate)
 
-        if validation is True:  # if placement is valid # and self.fair_play_rule(player, fence_direction, coordinate)
-            self.get_board()[coordinate].append(fence_direction)  # adds fence to board to check fair play rule
+        if validation is True:  # if placement is valid
+            square = self._board.index(coordinate)
+            saved_paths = self._path_finder.save()
+            self._board.add_fence(fence_direction, square)  # adds fence to board to check fair play rule
+            self._path_finder.fence_added(fence_direction, square)
             opponent_number = self.get_opponent(player).get_player_number()
-            fair_play = self.fair_play_rule(opponent_number)  # remove to deactivate fair_play
-            if fair_play == "breaks the fair play rule":  # remove to deactivate fair_play
-                self.get_board()[coordinate].remove(fence_direction)
+            if self.fair_play_rule(opponent_number) == "breaks the fair play rule" or \
+                    self.fair_play_rule(player) == "breaks the fair play rule":  # neither player may be walled in
+                self._board.remove_fence(fence_direction, square)
+                self._path_finder.restore(saved_paths)
                 return "breaks the fair play rule"
             else:
+                if self._undo_limit != 0:
+                    self._push_undo((fence_direction, player, square, saved_paths, self._turn, self._status,
+                                     self._key))
+                self._key ^= self._zobrist.fences[fence_direction][square] ^ \
+                    self._zobrist.fence_count(player, player_object.get_fences()) ^ \
+                    self._zobrist.fence_count(player, player_object.get_fences() - 1)
                 player_object.decrease_fences()
                 self.set_turn(opponent_number)
                 return True
@@ -284,60 +414,33 @@ class QuoridorGame:
             return False
 
     def check_for_fence(self, fence_direction, coordinate):  # helper function for validate fence placement
-        if fence_direction in self.get_board()[coordinate]:
+        if self._board.has_fence(fence_direction, self._board.index(coordinate)):
             return True  # fence found
         else:
             return False  # no fence found
 
-    def fair_play_rule(self, opponent, opponent_location=None, used=None):
+    def fair_play_rule(self, opponent, opponent_location=None):
         """Checks to see if fence placement breaks the game's fair play rule, meaning that
         the fence placement blocks the other player from the possibility of winning and reaching
-        the other side.
+        the other side. Uses the path finder's distance map, so it does not change the turn or recurse.
         :param: integer representing the opponent of the player placing the fence,
+        optional coordinate tuple to check from instead of the opponent's current position
         :returns: True if move doesn't block other player from possibility of winning
         breaks fair play rule if move blocks player from winning side of board"""
-        if used is None:  # first iteration
-            used = {}
-            self.set_turn(opponent)
-            opponent_location = self.check_player(opponent).get_player_position()
-
-        left_move = (opponent_location[0] - 1, opponent_location[1])
-        right_move = (opponent_location[0] + 1, opponent_location[1])
-        up_move = (opponent_location[0], opponent_location[1] - 1)
-        down_move = (opponent_location[0], opponent_location[1] + 1)
-
-        if opponent == self.get_player_one().get_player_number() and opponent_location[1] == 8:
-            return True  # if player one can get to the other side
-
-        if opponent == self.get_player_two().get_player_number() and opponent_location[1] == 0:
-            return True  # if player two can get to the other side
-
-        if self.validate_pawn_move(opponent, opponent_location, left_move) is True and left_move not in used:  # check left move
-            used[opponent_location] = opponent_location
-            return self.fair_play_rule(opponent, left_move, used)
-            return True
-
-        if self.validate_pawn_move(opponent, opponent_location, right_move) is True and right_move not in used:  # check right move
-            used[opponent_location] = opponent_location
-            self.fair_play_rule(opponent, right_move, used)
-            return True
-
-        if self.validate_pawn_move(opponent, opponent_location, up_move) is True and up_move not in used:  # check up move
-            used[opponent_location] = opponent_location
-            return self.fair_play_rule(opponent, up_move, used)
-            return True
-
-        if self.validate_pawn_move(opponent, opponent_location, down_move) is True and down_move not in used:  # check down move
-            used[opponent_location] = opponent_location
-            return self.fair_play_rule(opponent, down_move, used)
-            return True
-
+        if opponent_location is None:
+            square = self._board.get_pawn(opponent)
+        else:
+            square = self._board.index(opponent_location)
+        if square is not None and self._path_finder.distance(opponent, square) is not None:
+            return True  # opponent can still get to the other side
         else:
-            player_object = self.get_opponent(opponent)
-            player_number = player_object.get_player_number()
-            self.set_turn(player_number)
             return "breaks the fair play rule"
 
+    def shortest_path_length(self, player):
+        """:param: integer representing the player
+        :returns: fewest moves the player needs to reach the other side, ignoring pawns, or None if walled in."""
+        return self._path_finder.shortest_path_length(player)
+
     def validate_fence_placement(self, player, fence_direction, coordinate):  # helper function for place fence
         """
         Checks to see if a fence placement is valid.
@@ -349,16 +452,181 @@ class QuoridorGame:
         If invalid, returns False.
         """
         player_object = self.check_player(player)
-        if self.check_for_fence(fence_direction, coordinate) is False and \
-                self.get_status() == "IN PROGRESS" and \
-                player_object.get_fences() > 0 and \
-                coordinate[0] >= 0 and coordinate[1] >= 0 and coordinate[0] <= 8 and coordinate[1] <= 8 \
-                and self.get_turn() == player:
-            # if no fence already there and game in progress and player has remaining fences and not negative
+        if fence_direction in ("h", "v") and \
+                self.is_on_board(coordinate) and \
+                self.check_for_fence(fence_direction, coordinate) is False and \
+                self.get_status() == "IN PROGRESS" \
+                and self.get_turn() == player and \
+                player_object.get_fences() > 0:
+            # if fence on board and no fence already there and game in progress and player has remaining fences
             return True
         else:
             return False
 
+    def legal_pawn_moves(self, player):
+        """Lists every space the player's pawn can move to this turn.
+        :param: an integer that represents which player (1 or 2) is moving
+        :returns: list of coordinate tuples, empty if the game is won or it is not the player's turn."""
+        if self.get_status() != "IN PROGRESS" or self.get_turn() != player:
+            return []
+        board = self._board
+        coordinates = board.get_tables().coordinates
+        return [coordinates[square] for square in board.pawn_moves(board.get_pawn(player),
+                                                                     board.get_pawn(3 - player))]
+
+    def legal_fence_placements(self, player):
+        """Lists every fence the player can place this turn, including the fair play rule.
+        :param: an integer that represents which player (1 or 2) is placing the fence
+        :returns: list of (fence_direction, coordinate) tuples, empty if the game is won, it is not the player's
+        turn, or the player has no fences left."""
+        if self.get_status() != "IN PROGRESS" or self.get_turn() != player or \
+                self.check_player(player).get_fences() <= 0:
+            return []
+        board = self._board
+        fence_actions = board.get_tables().fence_actions
+        placements = []
+        for fence_direction, square in board.get_tables().fence_slots:
+            if not board.has_fence(fence_direction, square) and self._keeps_paths_open(fence_direction, square):
+                placements.append(fence_actions[fence_direction][square])
+        return placements
+
+    def legal_actions(self):
+        """Lists every legal action for the player whose turn it is. Pawn moves are ("move", coordinate) and fences
+        are (fence_direction, coordinate), the same arguments move_pawn and place_fence take after the player.
+        :returns: list of action tuples, pawn moves first, empty if the game is won."""
+        player = self.get_turn()
+        if self.get_status() != "IN PROGRESS":
+            return []
+        board = self._board
+        move_actions = board.get_tables().move_actions
+        actions = [move_actions[square] for square in board.pawn_moves(board.get_pawn(player),
+                                                                         board.get_pawn(3 - player))]
+        actions.extend(self.legal_fence_placements(player))
+        return actions
+
+    def path_blocking_fences(self, player):
+        """Lists the legal fences for the player whose turn it is that cut a step on one of player's shortest paths.
+        Only these fences can make player's path longer, so search code can use them instead of every fence.
+        :param: integer representing the player whose path is cut
+        :returns: list of (fence_direction, coordinate) tuples."""
+        mover = self.get_turn()
+        if self.get_status() != "IN PROGRESS" or self.check_player(mover).get_fences() <= 0:
+            return []
+        board = self._board
+        size = board.get_size()
+        fence_actions = board.get_tables().fence_actions
+        fences = []
+        for square, direction in self._path_finder.path_steps(player):
+            if direction == UP:
+                fence_direction, fence_square = "h", square
+            elif direction == DOWN:
+                fence_direction, fence_square = "h", square + size
+            elif direction == LEFT:
+                fence_direction, fence_square = "v", square
+            else:
+                fence_direction, fence_square = "v", square + 1
+            action = fence_actions[fence_direction][fence_square]
+            if action not in fences and self._keeps_paths_open(fence_direction, fence_square):
+                fences.append(action)
+        return fences
+
+    def distance_to_goal(self, player, coordinate):
+        """:param: integer representing the player, coordinate tuple
+        :returns: fewest moves from coordinate to the player's goal side, ignoring pawns, or None if there is no
+        path or the coordinate is off the board."""
+        square = self._board.index(coordinate)
+        if square is None:
+            return None
+        return self._path_finder.distance(player, square)
+
+    def path_lengths_after_fence(self, fence_direction, coordinate):
+        """Works out both players' shortest path lengths if a fence were placed, without placing it.
+        :param: a letter indicating whether it is vertical (v) or horizontal (h) fence, coordinate tuple
+        :returns: (player one length, player two length), (None, None) if the fence breaks the fair play rule,
+        or None if the fence slot is off the board or already taken."""
+        square = self._board.index(coordinate)
+        if fence_direction not in ("h", "v") or square is None or self._board.has_fence(fence_direction, square):
+            return None
+        return self._fence_path_lengths(fence_direction, square)
+
+    def _keeps_paths_open(self, fence_direction, square):
+        """:returns: True if adding a fence at square leaves both players a path to the other side.
+        The board and distance maps are left unchanged."""
+        if not self._board.may_enclose(fence_direction, square):
+            return True  # fence has a free end, so it cannot cut anyone off
+        return self._fence_path_lengths(fence_direction, square)[0] is not None
+
+    def _fence_path_lengths(self, fence_direction, square):
+        """Works out both players' shortest path lengths if a fence were added, without keeping it. Results are
+        cached in the transposition table when one is set, keyed on pawn squares, fences and the new fence.
+        :param: fence_direction ("h" or "v"), square index of a free fence slot
+        :returns: (player one length, player two length), or (None, None) if the fence breaks the fair play rule."""
+        table = self._table
+        if table is not None:
+            key = self._layout_key() ^ self._zobrist.fences[fence_direction][square] ^ self._zobrist.fair_play
+            entry = table.probe(key)
+            if entry is not None:
+                return entry[1]
+        saved_paths = self._path_finder.save()
+        self._board.add_fence(fence_direction, square)
+        self._path_finder.fence_added(fence_direction, square)
+        lengths = (self._path_finder.shortest_path_length(1), self._path_finder.shortest_path_length(2))
+        if lengths[0] is None or lengths[1] is None:
+            lengths = (None, None)
+        self._board.remove_fence(fence_direction, square)
+        self._path_finder.restore(saved_paths)
+        if table is not None:
+            table.store(key, 0, lengths)
+        return lengths
+
+    def _layout_key(self):
+        """:returns: Zobrist key of the pawn squares and fences only, leaving out fences left and the turn."""
+        zobrist = self._zobrist
+        return self.get_wall_key() ^ zobrist.pawn[1][self._player_one.get_square()] ^ \
+            zobrist.pawn[2][self._player_two.get_square()]
+
+    def get_wall_key(self):
+        """:returns: Zobrist key of the placed fences alone, the same for every position with the same fences."""
+        key = self._key ^ self._zobrist.fence_count(1, self._player_one.get_fences()) ^ \
+            self._zobrist.fence_count(2, self._player_two.get_fences())
+        if self._turn == 2:
+            key ^= self._zobrist.turn
+        return key
+
+    def apply(self, action):
+        """Plays an action for the player whose turn it is.
+        :param: action tuple as returned by legal_actions(): ("move", coordinate) or (fence_direction, coordinate)
+        :returns: the result of move_pawn or place_fence."""
+        if action[0] == "move":
+            return self.move_pawn(self.get_turn(), action[1])
+        return self.place_fence(self.get_turn(), action[0], action[1])
+
+    def _push_undo(self, record):
+        """Adds an undo record, dropping the oldest one if the undo limit is reached."""
+        self._undo_stack.append(record)
+        if self._undo_limit is not None and len(self._undo_stack) > self._undo_limit:
+            del self._undo_stack[0]
+
+    def undo(self):
+        """Takes back the last successful pawn move or fence placement, restoring pawn positions, fences, fence
+        counts, distance maps, turn and status exactly as they were.
+        :returns: True if a move was taken back, False if there is nothing to undo, or its record was dropped
+        because of the undo limit."""
+        if not self._undo_stack:
+            return False
+        kind, player, square, saved_paths, turn, status, key = self._undo_stack.pop()
+        player_object = self.check_player(player)
+        if kind == "move":
+            player_object.set_square(square)
+        else:
+            self._board.remove_fence(kind, square)
+            self._path_finder.restore(saved_paths)
+            player_object.increase_fences()
+        self._turn = turn
+        self._status = status
+        self._key = key
+        return True
+
     def is_winner(self, player):
         """To be used after making a move - checks to see whether player has won.
         :param:
@@ -366,14 +634,8 @@ class QuoridorGame:
         :return:
         returns True if that player has won and False if that player has not won."""
         player_object = self.check_player(player)
-        player_location = player_object.get_player_position()
-        if player == 1:
-            if player_location[1] == 8:
-                return True
-            else:
-                return False
-        elif player == 2:
-            if player_location[1] == 0:
+        if player == 1 or player == 2:
+            if player_object.get_player_position()[1] == self._board.get_goal_row(player):
                 return True
             else:
                 return False
@@ -388,16 +650,25 @@ class Player:
 
     The Player class interacts with the QuoridorGame instance which is the mechanism for playing the game. The
     Player class must interact with the QuoridorGame class because it stores all game specific information
-    such as the board, current game status, etc, as well as the methods to actually play the game."""
+    such as the board, current game status, etc, as well as the methods to actually play the game.
+
+    The position is kept as a square index; get_player_position() returns the shared coordinate tuple for it. The
+    player is the only place the position is kept: the board, path finder and Zobrist key of the player's game read
+    it from here, so set_position() moves the pawn for all of them."""
 
-    def __init__(self, player_number):
-        """Initializes player object"""
+    __slots__ = ("_player_number", "_fences", "_square", "_tables")
+
+    def __init__(self, player_number, size=BOARD_SIZE, fences=FENCES):
+        """Initializes player object
+        :param: player number, squares along each side of the board, fences the player starts with"""
         self._player_number = player_number  # 1 or 2
-        self._fences = 10  # both players start with 10 unplaced fences
-        if self.get_player_number() == 1:  # starting positions
-            self._position = (4, 0)
+        self._fences = fences  # both players start with the same number of unplaced fences
+        self._tables = MoveTables.for_size(size)  # coordinate tuple of each square
+        self._square = None
+        if self.get_player_number() == 1:  # starting positions, middle of the first and last rows
+            self.set_position((size // 2, 0))
         elif self.get_player_number() == 2:
-            self._position = (4, 8)
+            self.set_position((size // 2, size - 1))
 
     def get_player_number(self):
         """:returns: player number."""
@@ -409,7 +680,11 @@ class Player:
 
     def get_player_position(self):
         """:returns: current board position of the player."""
-        return self._position
+        return self._tables.coordinates[self._square]
+
+    def get_square(self):
+        """:returns: square index of the player's position."""
+        return self._square
 
     def decrease_fences(self):
         """Decreases the number of fences by 1.
@@ -420,8 +695,584 @@ class Player:
         else:
             return False
 
+    def set_fences(self, fences):
+        """Updates the number of fences the player has left.
+        :param: integer
+        :return: None"""
+        self._fences = fences
+
+    def increase_fences(self):
+        """Increases the number of fences by 1, used when a fence placement is taken back."""
+        self._fences += 1
+
     def set_position(self, position):
-        """Updates player's current position.
+        """Updates player's current position, which is also the position the player's game sees.
         :param: tuple representing coordinates as a parameter
         :return: None"""
-        self._position = position
+        self._square = position[1] * self._tables.size + position[0]
+
+    def set_square(self, square):
+        """Updates player's current position.
+        :param: square index"""
+        self._square = square
+
+
+class Board:
+    """Represents the board of a Quoridor game as integer bitmasks. Square (x, y) is bit y * size + x. A horizontal
+    fence at a square sits on the top edge of that square and a vertical fence sits on its left edge, matching the
+    "h" and "v" entries of the original list-based board. The board also keeps a byte per square with bit
+    1 << direction set when a fence or the edge of the board stops a pawn leaving the square that way, so checking a
+    step costs the same on every board size. Pawn squares are not stored here but read from the Player objects given
+    to set_players(), so a pawn's position is only kept in one place.
+
+    The Board class only stores state; rules such as turn order and the fair play rule live in QuoridorGame."""
+
+    __slots__ = ("_size", "_tables", "_h", "_v", "_blocked", "_pawns")
+
+    def __init__(self, size=BOARD_SIZE):
+        """Initializes an empty board with the outer fences in place."""
+        self._size = size
+        self._tables = MoveTables.for_size(size)  # shared lookup tables for this board size
+        self._h = self._tables.top_row  # fences on topmost side of board (prevents accidental fence placement)
+        self._v = self._tables.left_column  # fences on leftmost side of board (prevents accidental fence placement)
+        self._blocked = bytearray(self._tables.edge_flags)  # directions each square cannot be left in
+        self._pawns = [None, None, None]  # Player object on the board, indexed by player number
+
+    def get_size(self):
+        """:returns: number of squares along each side of the board."""
+        return self._size
+
+    def get_tables(self):
+        """:returns: the MoveTables for this board size."""
+        return self._tables
+
+    def get_offset(self, direction):
+        """:returns: how much a square index changes when moving one space in direction."""
+        return self._tables.offsets[direction]
+
+    def index(self, coordinate):
+        """Converts a coordinate to a square index.
+        :param: coordinate tuple
+        :returns: square index, or None if coordinate is not on the board."""
+        try:
+            x, y = coordinate
+        except (TypeError, ValueError):
+            return None
+        if type(x) is not int or type(y) is not int or not 0 <= x < self._size or not 0 <= y < self._size:
+            return None
+        return y * self._size + x
+
+    def coordinate(self, square):
+        """:returns: coordinate tuple of a square index."""
+        return self._tables.coordinates[square]
+
+    def get_blocked(self):
+        """:returns: bytearray indexed by square with bit 1 << direction set for each direction the square cannot be
+        left in. Must not be modified."""
+        return self._blocked
+
+    def is_blocked(self, square, direction):
+        """:returns: True if a fence or the edge of the board stops a pawn leaving square in direction."""
+        return self._blocked[square] >> direction & 1 == 1
+
+    def is_route_blocked(self, square, first, second):
+        """:returns: True if a two space move from square, first in direction first then in direction second,
+        crosses a fence or leaves the board."""
+        if self._blocked[square] >> first & 1:
+            return True
+        return self._blocked[square + self._tables.offsets[first]] >> second & 1 == 1
+
+    def has_fence(self, fence_direction, square):
+        """:returns: True if a fence of fence_direction ("h" or "v") is on square."""
+        if fence_direction == "h":
+            return self._h >> square & 1 == 1
+        return self._v >> square & 1 == 1
+
+    def add_fence(self, fence_direction, square):
+        """Places a fence of fence_direction ("h" or "v") on square. Does not check whether placement is valid."""
+        bit = 1 << square
+        if fence_direction == "h":
+            self._h |= bit
+            self._blocked[square] |= 1 << UP
+            self._blocked[square - self._size] |= 1 << DOWN  # square above, never on the outer top row
+        else:
+            self._v |= bit
+            self._blocked[square] |= 1 << LEFT
+            self._blocked[square - 1] |= 1 << RIGHT  # square to the left, never on the outer left column
+
+    def remove_fence(self, fence_direction, square):
+        """Removes a fence of fence_direction ("h" or "v") from square. Outer fences are never removed."""
+        bit = 1 << square
+        if fence_direction == "h":
+            self._h &= ~bit
+            self._blocked[square] &= ~(1 << UP)
+            self._blocked[square - self._size] &= ~(1 << DOWN)
+        else:
+            self._v &= ~bit
+            self._blocked[square] &= ~(1 << LEFT)
+            self._blocked[square - 1] &= ~(1 << RIGHT)
+
+    def pawn_moves(self, square, opponent_square):
+        """Lists every square a pawn can move to, including jumps over the opponent and diagonal steps around it
+        when a fence or the edge of the board is behind the opponent.
+        :param: square index of the pawn, square index of the other pawn
+        :returns: list of square indexes."""
+        tables = self._tables
+        blocked = self._blocked
+        moves = []
+        for direction in DIRECTIONS:
+            if blocked[square] >> direction & 1:
+                continue  # fence or edge of board in the way
+            step = tables.neighbours[direction][square]
+            if step != opponent_square:
+                moves.append(step)
+            elif not blocked[step] >> direction & 1:
+                moves.append(tables.jumps[direction][square])  # straight jump over opponent
+            else:
+                for side, target in tables.sidesteps[direction][square]:  # jump blocked, step around opponent
+                    if not blocked[step] >> side & 1:
+                        moves.append(target)
+        return moves
+
+    def is_pawn_move(self, square, opponent_square, target):
+        """Checks one move the way pawn_moves() lists them, without building the list.
+        :param: square index of the pawn, square index of the other pawn, square index to move to
+        :returns: True if the pawn can move to target."""
+        tables = self._tables
+        blocked = self._blocked
+        for direction in DIRECTIONS:
+            if blocked[square] >> direction & 1:
+                continue  # fence or edge of board in the way
+            step = tables.neighbours[direction][square]
+            if step != opponent_square:
+                if step == target:
+                    return True
+            elif not blocked[step] >> direction & 1:
+                if tables.jumps[direction][square] == target:
+                    return True  # straight jump over opponent
+            else:
+                for side, sidestep in tables.sidesteps[direction][square]:
+                    if sidestep == target and not blocked[step] >> side & 1:
+                        return True  # jump blocked, step around opponent
+        return False
+
+    def may_enclose(self, fence_direction, square):
+        """Checks whether a new fence could cut the board in two. A fence can only close off an area if both of its
+        ends already touch another fence or the edge of the board, so most fences are ruled out here without a
+        path search.
+        :param: fence_direction ("h" or "v"), square index where the fence would go
+        :returns: True if both ends of the fence touch a fence or the edge of the board."""
+        x, y = self._tables.coordinates[square]
+        if fence_direction == "h":
+            return self._corner_touched(x, y) and self._corner_touched(x + 1, y)
+        return self._corner_touched(x, y) and self._corner_touched(x, y + 1)
+
+    def _corner_touched(self, x, y):
+        """:returns: True if the corner at the top left of square (x, y) is on the edge or meets a fence."""
+        size = self._size
+        if x == 0 or y == 0 or x == size or y == size:
+            return True
+        square = y * size + x
+        return (self._h >> (square - 1) | self._h >> square | self._v >> (square - size) | self._v >> square) & 1 == 1
+
+    def set_fences(self, horizontal, vertical):
+        """Replaces every fence on the board.
+        :param: bitmask of horizontal fences, bitmask of vertical fences. The outer fences are always kept."""
+        tables = self._tables
+        self._h = tables.top_row
+        self._v = tables.left_column
+        self._blocked = bytearray(tables.edge_flags)
+        for fence_direction, mask in (("h", horizontal & ~tables.top_row), ("v", vertical & ~tables.left_column)):
+            while mask:
+                low = mask & -mask
+                self.add_fence(fence_direction, low.bit_length() - 1)
+                mask ^= low
+
+    def set_players(self, player_one, player_two):
+        """Sets the Player objects whose pawns stand on this board. The players keep the pawn squares."""
+        self._pawns = [None, player_one, player_two]
+
+    def get_pawn(self, player):
+        """:returns: square index of the player's pawn."""
+        return self._pawns[player].get_square()
+
+    def set_pawn(self, player, square):
+        """Moves the player's pawn to square."""
+        self._pawns[player].set_square(square)
+
+    def get_fences(self, fence_direction):
+        """:returns: bitmask of all fences of fence_direction ("h" or "v"), including the outer fences."""
+        if fence_direction == "h":
+            return self._h
+        return self._v
+
+    def get_goal_row(self, player):
+        """:returns: row the player must reach to win."""
+        if player == 1:
+            return self._size - 1
+        return 0
+
+    def view(self):
+        """:returns: read-only BoardView of this board."""
+        return BoardView(self)
+
+
+class PathFinder:
+    """Keeps a breadth-first distance-to-goal map for each player on a Board. Distances count pawn moves to the
+    player's goal row along the fences only, so they ignore the other pawn and jumps, which is what the fair play rule
+    asks. A new fence only forces a map to be rebuilt when it cuts the last shortest-path step out of a square;
+    most fences leave both maps untouched, so checking a fence is close to constant time.
+
+    Maps are replaced rather than changed in place, so save() and restore() can undo a fence by keeping references.
+    Each map is an array of two byte integers rather than a list, a sixth of the memory."""
+
+    __slots__ = ("_board", "_distances", "_instrumentation")
+
+    UNREACHABLE = -1  # distance stored for squares that cannot reach the goal row
+    _open_maps = {}  # both players' maps for a board with no fences, by board size, shared by every new game
+
+    def __init__(self, board):
+        """Initializes distance maps for both players."""
+        self._board = board
+        tables = board.get_tables()
+        if board.get_fences("h") == tables.top_row and board.get_fences("v") == tables.left_column:
+            size = board.get_size()
+            if size not in PathFinder._open_maps:
+                PathFinder._open_maps[size] = (self.build(1), self.build(2))
+            self._distances = [None] + list(PathFinder._open_maps[size])  # indexed by player number
+        else:
+            self._distances = [None, self.build(1), self.build(2)]  # indexed by player number
+
+    def build(self, player):
+        """Runs a breadth-first search outward from the player's goal row.
+        :param: integer representing the player
+        :returns: array of distances indexed by square, UNREACHABLE where the goal row cannot be reached."""
+        board = self._board
+        size = board.get_size()
+        goal_row = board.get_goal_row(player)
+        blocked = board.get_blocked()
+        offsets = board.get_tables().offsets
+        distances = [self.UNREACHABLE] * (size * size)
+        frontier = list(range(goal_row * size, goal_row * size + size))
+        for square in frontier:
+            distances[square] = 0
+        depth = 0
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for square in frontier:
+                exits = blocked[square]
+                for direction in DIRECTIONS:
+                    if not exits >> direction & 1:
+                        neighbour = square + offsets[direction]
+                        if distances[neighbour] == self.UNREACHABLE:
+                            distances[neighbour] = depth
+                            next_frontier.append(neighbour)
+            frontier = next_frontier
+        return array("h", distances)  # searched as a list, which is faster, and kept as a compact array
+
+    def distance(self, player, square):
+        """:returns: fewest moves from square to the player's goal row, or None if there is no path."""
+        distance = self._distances[player][square]
+        if distance == self.UNREACHABLE:
+            return None
+        return distance
+
+    def shortest_path_length(self, player):
+        """:returns: fewest moves the player's pawn needs to reach its goal row, or None if there is no path."""
+        return self.distance(player, self._board.get_pawn(player))
+
+    def path_steps(self, player):
+        """Lists every step that lies on at least one shortest path from the player's pawn to its goal row.
+        :param: integer representing the player
+        :returns: list of (square, direction) pairs, empty if the pawn is on its goal row or walled in."""
+        board = self._board
+        blocked = board.get_blocked()
+        offsets = board.get_tables().offsets
+        distances = self._distances[player]
+        start = board.get_pawn(player)
+        steps = []
+        seen = {start}
+        stack = [start]
+        while stack:
+            square = stack.pop()
+            target = distances[square] - 1
+            if target < 0:
+                continue  # on the goal row, or unreachable
+            for direction in DIRECTIONS:
+                if blocked[square] >> direction & 1:
+                    continue
+                neighbour = square + offsets[direction]
+                if distances[neighbour] == target:
+                    steps.append((square, direction))
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        stack.append(neighbour)
+        return steps
+
+    def get_distances(self, player):
+        """:returns: the player's distance map. Must not be modified."""
+        return self._distances[player]
+
+    def save(self):
+        """:returns: token that restore() accepts to bring back the current maps."""
+        return self._distances[1], self._distances[2]
+
+    def restore(self, saved):
+        """Brings back maps from a token returned by save()."""
+        self._distances[1], self._distances[2] = saved
+
+    def fence_added(self, fence_direction, square):
+        """Updates both maps after a fence of fence_direction ("h" or "v") was added to the board at square. A map is
+        rebuilt only if the fence cut a step that was on a shortest path and the square it was cut from has no
+        other step of the same length left."""
+        board = self._board
+        if fence_direction == "h":
+            other = square - board.get_size()  # fence sits between square and the one above
+        else:
+            other = square - 1  # fence sits between square and the one to its left
+        for player in (1, 2):
+            distances = self._distances[player]
+            if distances[square] == distances[other]:
+                continue  # step joined two squares at the same distance, or two unreachable squares
+            if distances[square] > distances[other]:
+                farther = square
+            else:
+                farther = other
+            if not self._has_step_down(distances, farther):
+                self._distances[player] = self.build(player)
+
+    def _has_step_down(self, distances, square):
+        """:returns: True if square still has an open step to a square one move closer to the goal."""
+        exits = self._board.get_blocked()[square]
+        offsets = self._board.get_tables().offsets
+        target = distances[square] - 1
+        for direction in DIRECTIONS:
+            if not exits >> direction & 1 and distances[square + offsets[direction]] == target:
+                return True
+        return False
+
+
+class ZobristKeys:
+    """Random 64 bit keys for Zobrist hashing positions on one board size. A position's key is the XOR of the keys
+    for each pawn square, each placed fence, each player's fences left and, when it is player two's turn, the turn
+    key, so a move changes the key with a few XORs. Keys come from a generator seeded with the board size, so every
+    process builds the same keys and keys can be stored on disk."""
+
+    _cache = {}  # ZobristKeys by board size
+
+    @classmethod
+    def for_size(cls, size):
+        """:returns: shared ZobristKeys for a board size, building them the first time."""
+        if size not in cls._cache:
+            cls._cache[size] = cls(size)
+        return cls._cache[size]
+
+    def __init__(self, size):
+        """Draws keys for a board with size squares on each side."""
+        generator = random.Random("zobrist %d" % size)
+        squares = size * size
+        self.size = size
+        self.pawn = [None] + [[generator.getrandbits(64) for _ in range(squares)] for _ in (1, 2)]
+        self.fences = {fence_direction: [generator.getrandbits(64) for _ in range(squares)]
+                       for fence_direction in ("h", "v")}
+        self.turn = generator.getrandbits(64)  # included when it is player two's turn
+        self.fair_play = generator.getrandbits(64)  # marks cached fair play results in a TranspositionTable
+        self._fence_counts = [None, [], []]  # keys for fences left, indexed by player then count
+        self._count_generators = [None, random.Random("fences %d 1" % size),
+                                  random.Random("fences %d 2" % size)]
+
+    def fence_count(self, player, count):
+        """:returns: key for the player having count fences left. Keys are drawn as needed from a generator per
+        player, so they do not depend on which counts were asked for first."""
+        keys = self._fence_counts[player]
+        while len(keys) <= count:
+            keys.append(self._count_generators[player].getrandbits(64))
+        return keys[count]
+
+    def __reduce__(self):
+        """Pickles and copies as a reference to the shared keys for this size."""
+        return ZobristKeys.for_size, (self.size,)
+
+    def __deepcopy__(self, memo):
+        """:returns: self, since the keys never change."""
+        return self
+
+
+class TranspositionTable:
+    """Fixed size cache of results keyed by Zobrist key, for search results and fair play results. The caller sets
+    the memory limit and the table never grows past it. Each key maps to one slot; a new result replaces the slot's
+    current one if the slot is empty, holds the same key, was stored during an earlier search, or was searched less
+    deeply than the new result.
+
+    Entries are kept in parallel lists allocated up front, so storing a result does not allocate a container."""
+
+    EXACT, LOWER, UPPER = 0, 1, 2  # what a stored value is: exact score, lower bound, or upper bound
+    ENTRY_BYTES = 128  # rough memory cost of one slot, including the key and value objects it refers to
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        """Initializes an empty table.
+        :param: most memory the table may use, in bytes."""
+        self._capacity = max(1, max_bytes // self.ENTRY_BYTES)
+        self._keys = [None] * self._capacity
+        self._depths = [0] * self._capacity
+        self._ages = [0] * self._capacity
+        self._values = [None] * self._capacity
+        self._flags = [0] * self._capacity
+        self._moves = [None] * self._capacity
+        self._age = 0
+
+    def get_capacity(self):
+        """:returns: number of slots in the table."""
+        return self._capacity
+
+    def new_search(self):
+        """Marks the start of a new search, so results from earlier searches are replaced first."""
+        self._age += 1
+
+    def clear(self):
+        """Removes every entry."""
+        empty = [None] * self._capacity
+        self._keys[:] = empty  # replaced in place, so the lists keep their preallocated size
+        self._values[:] = empty
+        self._moves[:] = empty
+
+    def probe(self, key):
+        """Looks up a result.
+        :param: Zobrist key
+        :returns: (depth, value, flag, move) tuple, or None if the key is not in the table."""
+        slot = key % self._capacity
+        if self._keys[slot] != key:
+            return None
+        return self._depths[slot], self._values[slot], self._flags[slot], self._moves[slot]
+
+    def store(self, key, depth, value, flag=EXACT, move=None):
+        """Stores a result unless the slot holds a deeper result for another key from the current search.
+        :param: Zobrist key, search depth of the result, value, EXACT/LOWER/UPPER flag, best move or None
+        :returns: True if the result was stored."""
+        slot = key % self._capacity
+        if self._keys[slot] is not None and self._keys[slot] != key and \
+                self._ages[slot] == self._age and self._depths[slot] > depth:
+            return False
+        self._keys[slot] = key
+        self._depths[slot] = depth
+        self._ages[slot] = self._age
+        self._values[slot] = value
+        self._flags[slot] = flag
+        self._moves[slot] = move
+        return True
+
+
+class BoardView(Mapping):
+    """Read-only view of a Board that looks like the original dictionary board: each coordinate tuple maps to a list
+    holding "v", "h", "P1" and "P2" entries for that square. Lists are built when a square is looked up, so holding a
+    view costs nothing until it is used."""
+
+    __slots__ = ("_board",)
+
+    def __init__(self, board):
+        """Initializes view of board."""
+        self._board = board
+
+    def __getitem__(self, coordinate):
+        """:returns: list of entries on the square at coordinate."""
+        board = self._board
+        square = board.index(coordinate)
+        if square is None:
+            raise KeyError(coordinate)
+        entries = []
+        if board.has_fence("v", square):
+            entries.append("v")
+        if board.has_fence("h", square):
+            entries.append("h")
+        for player in (1, 2):
+            if board.get_pawn(player) == square:
+                entries.append("P" + str(player))
+        return entries
+
+    def __contains__(self, coordinate):
+        """:returns: True if coordinate is on the board."""
+        return self._board.index(coordinate) is not None
+
+    def __iter__(self):
+        """Iterates over coordinates in the same order as the original board."""
+        size = self._board.get_size()
+        for x in range(size):
+            for y in range(size):
+                yield (x, y)
+
+    def __len__(self):
+        """:returns: number of squares on the board."""
+        return self._board.get_size() ** 2
+
+
+class MoveTables:
+    """Lookup tables for one board size, built once and shared by every Board of that size. Squares are indexed as
+    y * size + x. Table entries are -1 where a move would leave the board; callers check the Board's blocked flags
+    first, which already include the edges, so those entries are never used.
+
+    neighbours[direction][square] is the square one space away, jumps[direction][square] the square two spaces away,
+    and sidesteps[direction][square] holds (side, square) pairs for the diagonal steps around a pawn standing on
+    neighbours[direction][square]. move_actions and fence_actions hold the action tuples returned by
+    QuoridorGame.legal_actions(), so listing moves builds no new tuples."""
+
+    _cache = {}  # MoveTables by board size
+
+    @classmethod
+    def for_size(cls, size):
+        """:returns: shared MoveTables for a board size, building them the first time."""
+        if size not in cls._cache:
+            cls._cache[size] = cls(size)
+        return cls._cache[size]
+
+    def __init__(self, size):
+        """Builds the tables for a board with size squares on each side."""
+        squares = size * size
+        self.size = size
+        self.offsets = (-size, size, -1, 1)  # square offset for UP, DOWN, LEFT, RIGHT
+        self.coordinates = [(square % size, square // size) for square in range(squares)]
+        self.neighbours = [[self._step(square, (direction,)) for square in range(squares)] for direction in DIRECTIONS]
+        self.jumps = [[self._step(square, (direction, direction)) for square in range(squares)]
+                      for direction in DIRECTIONS]
+        self.sidesteps = [[tuple((side, self._step(square, (direction, side))) for side in SIDESTEPS[direction])
+                           for square in range(squares)] for direction in DIRECTIONS]
+
+        self.top_row = (1 << size) - 1
+        self.left_column = 0
+        for y in range(size):
+            self.left_column |= 1 << (y * size)
+        self.edge_flags = bytes((y == 0) << UP | (y == size - 1) << DOWN | (x == 0) << LEFT | (x == size - 1) << RIGHT
+                                for x, y in self.coordinates)  # directions that leave the board from each square
+
+        self.move_actions = [("move", coordinate) for coordinate in self.coordinates]
+        self.fence_actions = {fence_direction: [(fence_direction, coordinate) for coordinate in self.coordinates]
+                              for fence_direction in ("h", "v")}
+        self.fence_slots = tuple([("h", square) for square in range(size, squares)] +
+                                 [("v", square) for square in range(squares) if square % size != 0])
+
+    def __reduce__(self):
+        """Pickles and copies as a reference to the shared tables for this size."""
+        return MoveTables.for_size, (self.size,)
+
+    def __deepcopy__(self, memo):
+        """:returns: self, since the tables never change."""
+        return self
+
+    def _step(self, square, directions):
+        """:returns: square reached by moving one space in each of directions, or -1 if that leaves the board."""
+        x, y = self.coordinates[square]
+        for direction in directions:
+            if direction == UP:
+                y -= 1
+            elif direction == DOWN:
+                y += 1
+            elif direction == LEFT:
+                x -= 1
+            else:
+                x += 1
+        if 0 <= x < self.size and 0 <= y < self.size:
+            return y * self.size + x
+        return -1
+
+
+MoveTables.for_size(BOARD_SIZE)  # standard board tables are built at import time
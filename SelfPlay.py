@@ -0,0 +1,239 @@
+"""Runs games between two computer players across a pool of worker processes, for self-play datasets and for
+tournaments between bot versions. Finished games are appended to a JSON lines file as they complete and only
+running totals are kept in memory. The first line of the file records the settings that decide the games: the two
+players, seed, move limit, board size and fences. A run that was interrupted picks up where it stopped when started
+again with --resume and the same settings, and refuses to add to a file written with other settings.
+
+Example:
+    python SelfPlay.py --games 1000 --player-a engine:50 --player-b greedy --workers 8 --output games.jsonl
+
+Players are "random", "greedy", "engine:<milliseconds per move>" or "mcts:<playouts per move>"."""
+
+import argparse
+import json
+import os
+import random
+import time
+from multiprocessing import Pool
+
+from Engine import Engine
+from MCTS import MCTS
+from Quoridor import BOARD_SIZE, FENCES, QuoridorGame
+
+
+class RandomPlayer:
+    """Plays a random legal pawn move, or now and then a random legal fence."""
+
+    def __init__(self, seed):
+        """Initializes player with a random seed."""
+        self._random = random.Random(seed)
+
+    def choose_move(self, game):
+        """:returns: action tuple for the player whose turn it is, or None if the player has no legal action."""
+        player = game.get_turn()
+        moves = game.legal_pawn_moves(player)
+        if self._random.random() < 0.1 or not moves:
+            fences = game.legal_fence_placements(player)
+            if fences:
+                return self._random.choice(fences)
+        if not moves:
+            return None  # pawn is boxed in by the other pawn and no fence can be placed
+        return ("move", self._random.choice(moves))
+
+
+class GreedyPlayer:
+    """Always moves its pawn along a shortest path and never places fences."""
+
+    def __init__(self, seed):
+        """Initializes player with a random seed used to break ties."""
+        self._random = random.Random(seed)
+
+    def choose_move(self, game):
+        """:returns: action tuple for the player whose turn it is, or None if its pawn cannot move."""
+        player = game.get_turn()
+        moves = game.legal_pawn_moves(player)
+        if not moves:
+            return None  # pawn is boxed in by the other pawn
+        best = min(game.distance_to_goal(player, move) for move in moves)
+        return ("move", self._random.choice([move for move in moves if game.distance_to_goal(player, move) == best]))
+
+
+class EnginePlayer:
+    """Plays Engine moves with a fixed time budget per move."""
+
+    def __init__(self, time_limit_ms):
+        """Initializes player with its time budget per move in milliseconds."""
+        self._engine = Engine(table_bytes=4 * 1024 * 1024)
+        self._time_limit_ms = time_limit_ms
+
+    def choose_move(self, game):
+        """:returns: action tuple for the player whose turn it is."""
+        return self._engine.choose_move(game, self._time_limit_ms)
+
+
+def make_player(spec, seed):
+    """Builds a player from its command line description.
+    :param: "random", "greedy", "engine:<ms>" or "mcts:<playouts>", random seed
+    :returns: object with a choose_move(game) method."""
+    name, _, argument = spec.partition(":")
+    if name == "random":
+        return RandomPlayer(seed)
+    elif name == "greedy":
+        return GreedyPlayer(seed)
+    elif name == "engine":
+        return EnginePlayer(int(argument or 100))
+    elif name == "mcts":
+        return MCTS(playouts=int(argument or 1000), time_limit_ms=None, workers=1, seed=seed)
+    raise ValueError("unknown player: " + spec)
+
+
+def play_game(job):
+    """Plays one game. Runs in a worker process.
+    :param: (game number, player A description, player B description, random seed, move limit, board size, fences
+    per player)
+    :returns: dictionary describing the finished game."""
+    number, spec_a, spec_b, seed, max_moves, size, fences = job
+    start = time.perf_counter()
+    swapped = number % 2 == 1  # players change sides every game
+    seats = {1: spec_b if swapped else spec_a, 2: spec_a if swapped else spec_b}
+    players = {seat: make_player(seats[seat], seed * 2 + seat) for seat in (1, 2)}
+    game = QuoridorGame(size, fences)
+    moves = []
+    while game.get_status() == "IN PROGRESS" and len(moves) < max_moves:
+        player = game.get_turn()
+        action = players[player].choose_move(game)
+        if action is None:
+            break
+        if action[0] == "move":
+            result = game.move_pawn(player, action[1])
+        else:
+            result = game.place_fence(player, action[0], action[1])
+        if result is not True:
+            raise RuntimeError("player %s made an illegal move: %r" % (seats[player], action))
+        moves.append([action[0], list(action[1])])
+
+    winner = None
+    if game.get_winner() == 1:
+        winner = "B" if swapped else "A"
+    elif game.get_winner() == 2:
+        winner = "A" if swapped else "B"
+    return {"game": number, "player1": seats[1], "player2": seats[2], "winner": winner, "plies": len(moves),
+            "seconds": time.perf_counter() - start, "moves": moves}
+
+
+def run_settings(args):
+    """:returns: dictionary of the settings that decide a run's games, written as the first line of its output."""
+    return {"player_a": args.player_a, "player_b": args.player_b, "seed": args.seed, "max_moves": args.max_moves,
+            "size": args.size, "fences": args.fences}
+
+
+def new_counts():
+    """:returns: dictionary of running totals over finished games."""
+    return {"games": 0, "plies": 0, "A": 0, "B": 0, "unfinished": 0}
+
+
+def count_game(counts, record):
+    """Adds one finished game to the running totals."""
+    counts["games"] += 1
+    counts["plies"] += record["plies"]
+    counts[record["winner"] or "unfinished"] += 1
+
+
+def read_finished(path, settings, counts, done):
+    """Reads the games already written by an earlier run one line at a time, adding them to counts and marking
+    them in done, and drops a last line cut off by an interruption.
+    :param: output file path, run_settings() of this run, running totals, bytearray with one flag per game number
+    :returns: whether the file holds the first line of a run. Raises ValueError if the file was written by a run
+    with other settings."""
+    if not os.path.exists(path):
+        return False
+    started = False
+    with open(path, "rb+") as output:
+        end = 0
+        for line in output:
+            if not line.endswith(b"\n"):
+                output.truncate(end)  # the interrupted run stopped in the middle of writing a game
+                break
+            end += len(line)
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not started:
+                if record.get("run") != settings:
+                    raise ValueError("%s was written by a run with other settings: %s" % (path, line.decode().strip()))
+                started = True
+                continue
+            if record["game"] < len(done):
+                done[record["game"]] = 1
+            count_game(counts, record)
+    return started
+
+
+def summarize(counts, new_games, new_moves, seconds):
+    """:returns: dictionary of throughput for this run and win rates over every finished game."""
+    finished = counts["games"]
+    return {"games": finished, "moves": counts["plies"], "games_this_run": new_games, "seconds": seconds,
+            "games_per_second": new_games / seconds if seconds else 0.0,
+            "moves_per_second": new_moves / seconds if seconds else 0.0,
+            "win_rate_a": counts["A"] / finished if finished else 0.0,
+            "win_rate_b": counts["B"] / finished if finished else 0.0,
+            "unfinished_rate": counts["unfinished"] / finished if finished else 0.0}
+
+
+def main(argv=None):
+    """Runs the command line entry point.
+    :param: argument list, or None to use sys.argv
+    :returns: summary dictionary."""
+    parser = argparse.ArgumentParser(description="Run games between two players and report throughput.")
+    parser.add_argument("--games", type=int, default=100, help="number of games in the run")
+    parser.add_argument("--player-a", default="greedy", help="first player (takes player one in even games)")
+    parser.add_argument("--player-b", default="random", help="second player")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--output", default="games.jsonl", help="JSON lines file finished games are appended to")
+    parser.add_argument("--resume", action="store_true", help="skip games already in the output file")
+    parser.add_argument("--seed", type=int, default=0, help="base random seed; game n uses seed + n")
+    parser.add_argument("--max-moves", type=int, default=400, help="moves before a game is stopped unfinished")
+    parser.add_argument("--size", type=int, default=BOARD_SIZE, help="squares along each side of the board")
+    parser.add_argument("--fences", type=int, default=FENCES, help="fences each player starts with")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    settings = run_settings(args)
+    counts = new_counts()
+    done = bytearray(args.games)  # 1 for each game number already in the output file
+    started = False
+    if args.resume:
+        try:
+            started = read_finished(args.output, settings, counts, done)
+        except ValueError as error:
+            parser.error(str(error))
+    if not started:
+        with open(args.output, "w") as output:
+            output.write(json.dumps({"run": settings}) + "\n")
+    jobs = [(number, args.player_a, args.player_b, args.seed + number, args.max_moves, args.size, args.fences)
+            for number in range(args.games) if not done[number]]
+
+    start = time.perf_counter()
+    new_moves = 0
+    with open(args.output, "a") as output, Pool(args.workers) as pool:
+        for record in pool.imap_unordered(play_game, jobs):
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            count_game(counts, record)
+            new_moves += record["plies"]
+    summary = summarize(counts, len(jobs), new_moves, time.perf_counter() - start)
+
+    if args.json:
+        print(json.dumps(summary))
+    else:
+        print("%d games (%d this run) in %.1fs: %.2f games/s, %.1f moves/s" % (
+            summary["games"], summary["games_this_run"], summary["seconds"], summary["games_per_second"],
+            summary["moves_per_second"]))
+        print("%s wins %.1f%%, %s wins %.1f%%, unfinished %.1f%%" % (
+            args.player_a, 100 * summary["win_rate_a"], args.player_b, 100 * summary["win_rate_b"],
+            100 * summary["unfinished_rate"]))
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""Endgame tablebases for positions where both players have placed all their fences. With no fences left the fences
+on the board never change, so the game is a pawn race that can be solved exactly: solve() works backwards from every
+won position to find, for each pair of pawn squares and each side to move, whether the player to move wins, loses or
+can only draw, and in how many moves.
+
+A 9x9 layout has 81 * 81 * 2 positions and solves in a fraction of a second. Tablebases for layouts that come up
+often can be written to a file with write_tablebases(); TablebaseFile maps the file with mmap and finds a layout
+through a hash index in constant time, reading nothing up front.
+
+Example:
+    python Tablebase.py --records games.qgr --output endgames.qtb --layouts 1000
+
+File format, little-endian: magic "QT", format version, board size, number of layouts and number of index slots,
+then one (wall key, offset) pair of 8 byte integers per index slot, offset 0 marking an empty slot. Each layout at
+its offset holds the horizontal and vertical fence bitmasks, ceil(n * n / 8) bytes each, followed by the results
+as 2 byte integers indexed like Tablebase.index()."""
+
+import argparse
+import mmap
+import struct
+import sys
+from array import array
+
+from GameRecord import GameReader
+from Quoridor import BOARD_SIZE, Board, MoveTables, ZobristKeys
+
+WIN, LOSS, DRAW = "WIN", "LOSS", "DRAW"  # result for the player to move
+MAGIC = b"QT"
+VERSION = 1
+HEADER = struct.Struct("<2sBBII")
+SLOT = struct.Struct("<QQ")
+
+
+def wall_key(size, horizontal, vertical):
+    """:param: board size, horizontal and vertical fence bitmasks
+    :returns: Zobrist key of the fences, equal to QuoridorGame.get_wall_key() for a game with these fences."""
+    zobrist = ZobristKeys.for_size(size)
+    key = 0
+    for fence_direction, square in MoveTables.for_size(size).fence_slots:
+        mask = horizontal if fence_direction == "h" else vertical
+        if mask >> square & 1:
+            key ^= zobrist.fences[fence_direction][square]
+    return key
+
+
+def solve(size, horizontal, vertical):
+    """Solves every pawn race on one fence layout by retrograde analysis.
+    :param: board size, horizontal and vertical fence bitmasks
+    :returns: Tablebase for the layout."""
+    board = Board(size)
+    board.set_fences(horizontal, vertical)
+    squares = size * size
+    count = 2 * squares * squares
+    goal_rows = (None, board.get_goal_row(1), board.get_goal_row(2))
+    values = array("h", bytes(2 * count))  # 0 until solved, then Tablebase encoding
+    predecessors = [[] for _ in range(count)]
+    unsolved_moves = [0] * count
+    frontier = []
+
+    for turn in (1, 2):
+        for square_one in range(squares):
+            for square_two in range(squares):
+                if square_one == square_two:
+                    continue
+                position = Tablebase.index(size, square_one, square_two, turn)
+                if square_one // size == goal_rows[1] or square_two // size == goal_rows[2]:
+                    values[position] = -1  # a pawn is home: the player who just moved has won
+                    frontier.append(position)
+                    continue
+                if turn == 1:
+                    moves = [Tablebase.index(size, target, square_two, 2)
+                             for target in board.pawn_moves(square_one, square_two)]
+                else:
+                    moves = [Tablebase.index(size, square_one, target, 1)
+                             for target in board.pawn_moves(square_two, square_one)]
+                unsolved_moves[position] = len(moves)
+                for move in moves:
+                    predecessors[move].append(position)
+
+    # frontier is processed in order of distance, so each position is solved with its shortest win or longest loss
+    for position in frontier:
+        value = values[position]
+        for previous in predecessors[position]:
+            if values[previous] != 0:
+                continue
+            if value < 0:
+                values[previous] = -value  # moving here wins: win in one more move than the loss
+                frontier.append(previous)
+            else:
+                unsolved_moves[previous] -= 1
+                if unsolved_moves[previous] == 0:
+                    values[previous] = -(value + 2)  # every move lets the opponent win: lose one move later
+                    frontier.append(previous)
+    return Tablebase(size, horizontal, vertical, values)
+
+
+class Tablebase:
+    """Exact results for every pawn race on one fence layout. Each position is stored as a 2 byte integer: n > 0
+    when the player to move wins in n moves, -n when the player to move has lost in n - 1 moves (-1 when the other
+    pawn is already home), and 0 for a draw, where neither player can force a win, or for both pawns on one square."""
+
+    def __init__(self, size, horizontal, vertical, values):
+        """Initializes tablebase.
+        :param: board size, horizontal and vertical fence bitmasks, sequence of encoded results indexed by index()"""
+        self._size = size
+        self._horizontal = horizontal | MoveTables.for_size(size).top_row
+        self._vertical = vertical | MoveTables.for_size(size).left_column
+        self._values = values
+
+    @staticmethod
+    def index(size, square_one, square_two, turn):
+        """:returns: position number of player one on square_one and player two on square_two with turn to move."""
+        squares = size * size
+        return ((turn - 1) * squares + square_one) * squares + square_two
+
+    def get_size(self):
+        """:returns: board size."""
+        return self._size
+
+    def get_fences(self):
+        """:returns: (horizontal, vertical) fence bitmasks of the layout, including the outer fences."""
+        return self._horizontal, self._vertical
+
+    def get_values(self):
+        """:returns: the encoded results, indexed by index()."""
+        return self._values
+
+    def matches(self, game):
+        """:returns: True if game has both players out of fences and this tablebase's fences."""
+        state = game.get_state()
+        return state[2] == 0 and state[3] == 0 and state[4] == self._horizontal and state[5] == self._vertical
+
+    def lookup(self, square_one, square_two, turn):
+        """:param: square index of player one, square index of player two, player to move
+        :returns: (WIN, LOSS or DRAW for the player to move, moves until the game ends with best play, or None for a
+        draw)."""
+        value = self._values[self.index(self._size, square_one, square_two, turn)]
+        if value > 0:
+            return WIN, value
+        elif value < 0:
+            return LOSS, -value - 1
+        return DRAW, None
+
+    def probe(self, game):
+        """:param: QuoridorGame with this tablebase's fences and no fences left
+        :returns: lookup() result for the game's position."""
+        position_one, position_two = game.get_state()[:2]
+        return self.lookup(position_one[1] * self._size + position_one[0],
+                           position_two[1] * self._size + position_two[0], game.get_turn())
+
+    def best_move(self, game):
+        """Picks a perfect move: the fastest win, otherwise a draw, otherwise the slowest loss.
+        :param: QuoridorGame with this tablebase's fences and no fences left
+        :returns: ("move", coordinate) action, or None if the player to move has no move."""
+        player = game.get_turn()
+        size = self._size
+        opponent_x, opponent_y = game.check_player(3 - player).get_player_position()
+        opponent_square = opponent_y * size + opponent_x
+        best_action, best_rank = None, None
+        for coordinate in game.legal_pawn_moves(player):
+            square = coordinate[1] * size + coordinate[0]
+            if player == 1:
+                result, moves = self.lookup(square, opponent_square, 2)
+            else:
+                result, moves = self.lookup(opponent_square, square, 1)
+            if result == LOSS:
+                rank = (2, -moves)  # opponent loses: prefer the quickest
+            elif result == DRAW:
+                rank = (1, 0)
+            else:
+                rank = (0, moves)  # opponent wins: put it off as long as possible
+            if best_rank is None or rank > best_rank:
+                best_action, best_rank = ("move", coordinate), rank
+        return best_action
+
+
+def write_tablebases(path, tablebases):
+    """Writes tablebases for one board size to a file TablebaseFile can open.
+    :param: file path, list of Tablebase objects of the same size
+    :returns: number of bytes written."""
+    size = tablebases[0].get_size() if tablebases else BOARD_SIZE
+    slots = 1
+    while slots < 2 * len(tablebases):
+        slots *= 2  # at most half full, so lookups rarely probe more than one slot
+    mask_bytes = (size * size + 7) // 8
+    offset = HEADER.size + slots * SLOT.size
+    index = [(0, 0)] * slots
+    body = []
+    for tablebase in tablebases:
+        horizontal, vertical = tablebase.get_fences()
+        key = wall_key(size, horizontal, vertical)
+        slot = key & (slots - 1)
+        while index[slot][1] != 0:
+            slot = (slot + 1) & (slots - 1)
+        index[slot] = (key, offset)
+        values = array("h", tablebase.get_values())
+        if sys.byteorder != "little":
+            values.byteswap()
+        entry = horizontal.to_bytes(mask_bytes, "little") + vertical.to_bytes(mask_bytes, "little") + \
+            values.tobytes()
+        body.append(entry)
+        offset += len(entry)
+    with open(path, "wb") as output:
+        output.write(HEADER.pack(MAGIC, VERSION, size, len(tablebases), slots))
+        for key, entry_offset in index:
+            output.write(SLOT.pack(key, entry_offset))
+        for entry in body:
+            output.write(entry)
+    return offset
+
+
+class TablebaseFile:
+    """Tablebase file opened through mmap. find() looks a layout up in the file's hash index and returns a Tablebase
+    reading its results straight from the mapped file."""
+
+    def __init__(self, path):
+        """Maps the file at path. Raises ValueError if it is not a tablebase file."""
+        self._file = open(path, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, size, layouts, slots = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION:
+            self._data.close()
+            self._file.close()
+            raise ValueError("not a tablebase file: " + path)
+        self._size = size
+        self._layouts = layouts
+        self._slots = slots
+        self._mask_bytes = (size * size + 7) // 8
+        self._entries = 2 * size ** 4
+        self._view = memoryview(self._data)
+        self._exports = []  # views of the file handed out in tablebases, released by close()
+        self._found = {}  # Tablebase by offset, so each layout's views of the file are made once
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        """:returns: number of layouts in the file."""
+        return self._layouts
+
+    def get_size(self):
+        """:returns: board size of the file's layouts."""
+        return self._size
+
+    def find(self, size, horizontal, vertical, key=None):
+        """Looks up a layout. Finding the same layout again returns the same Tablebase.
+        :param: board size, horizontal and vertical fence bitmasks, their wall_key() if already known
+        :returns: Tablebase for the layout, or None if the file does not have it."""
+        if size != self._size or not self._slots:
+            return None
+        tables = MoveTables.for_size(size)
+        horizontal |= tables.top_row
+        vertical |= tables.left_column
+        if key is None:
+            key = wall_key(size, horizontal, vertical)
+        mask_bytes = self._mask_bytes
+        slot = key & (self._slots - 1)
+        while True:
+            slot_key, offset = SLOT.unpack_from(self._data, HEADER.size + slot * SLOT.size)
+            if offset == 0:
+                return None
+            if slot_key == key and \
+                    int.from_bytes(self._data[offset:offset + mask_bytes], "little") == horizontal and \
+                    int.from_bytes(self._data[offset + mask_bytes:offset + 2 * mask_bytes], "little") == vertical:
+                tablebase = self._found.get(offset)
+                if tablebase is None:
+                    start = offset + 2 * mask_bytes
+                    if sys.byteorder == "little":
+                        window = self._view[start:start + 2 * self._entries]
+                        values = window.cast("h")
+                        self._exports += [values, window]
+                    else:
+                        values = array("h", self._data[start:start + 2 * self._entries])
+                        values.byteswap()
+                    tablebase = Tablebase(size, horizontal, vertical, values)
+                    self._found[offset] = tablebase
+                return tablebase
+            slot = (slot + 1) & (self._slots - 1)
+
+    def find_game(self, game):
+        """:returns: Tablebase for the game's fences, or None if the file does not have them."""
+        state = game.get_state()
+        size = game.get_size()
+        return self.find(size, state[4], state[5], game.get_wall_key())
+
+    def close(self):
+        """Unmaps and closes the file. Tablebases found in it must not be used afterwards."""
+        self._found.clear()
+        for view in self._exports:
+            view.release()
+        self._view.release()
+        self._data.close()
+        self._file.close()
+
+
+def common_layouts(paths, limit):
+    """Finds the fence layouts that games in record files most often reach with both players out of fences.
+    :param: list of GameRecord file paths, most layouts to return
+    :returns: list of (size, horizontal, vertical) tuples, most common first."""
+    counts = {}
+    for path in paths:
+        with GameReader(path) as reader:
+            for record in reader:
+                game = record.position_at(0)
+                for action in record.actions():
+                    if game.apply(action) is not True:
+                        break  # damaged record, use what was read of it
+                    state = game.get_state()
+                    if state[2] == 0 and state[3] == 0:
+                        layout = (record.get_size(), state[4], state[5])
+                        counts[layout] = counts.get(layout, 0) + 1
+                        break  # fences cannot change from here on
+    return sorted(counts, key=lambda layout: -counts[layout])[:limit]
+
+
+def main(argv=None):
+    """Runs the command line entry point.
+    :param: argument list, or None to use sys.argv"""
+    parser = argparse.ArgumentParser(description="Build a tablebase file for common fence layouts.")
+    parser.add_argument("--records", nargs="+", required=True, help="GameRecord files to take layouts from")
+    parser.add_argument("--output", default="endgames.qtb", help="tablebase file to write")
+    parser.add_argument("--layouts", type=int, default=1000, help="most layouts to solve")
+    args = parser.parse_args(argv)
+    layouts = common_layouts(args.records, args.layouts)
+    written = write_tablebases(args.output, [solve(*layout) for layout in layouts])
+    print("%d layouts, %d bytes written to %s" % (len(layouts), written, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import random
+import unittest
+from unittest import mock
+
+import Tablebase
+from Analysis import Analyzer, analyze, analyze_many
+from GameRecord import encode_position
+from Quoridor import QuoridorGame
+
+
+def near_endgame_positions(games=12, size=5, fences=2, seed=11):
+    """Plays random games until the player to move holds the last fence, then lists the positions after each fence
+    the engine would search there, followed by the position itself. Analysing them in that order solves the endgames
+    that the search from the last position reaches.
+    :returns: list of position encodings."""
+    generator = random.Random(seed)
+    positions = []
+    for _ in range(games):
+        game = QuoridorGame(size, fences)
+        while game.get_status() == "IN PROGRESS":
+            player = game.get_turn()
+            if game.check_player(player).get_fences() == 1 and game.check_player(3 - player).get_fences() == 0:
+                for action in game.path_blocking_fences(3 - player):
+                    game.apply(action)
+                    positions.append(encode_position(game))
+                    game.undo()
+                positions.append(encode_position(game))
+                break
+            actions = game.legal_actions()
+            fences_left = [action for action in actions if action[0] != "move"]
+            if fences_left and generator.random() < 0.5:
+                actions = fences_left
+            game.apply(generator.choice(actions))
+    return positions
+
+
+class AnalysisTest(unittest.TestCase):
+    """Tests that analysing positions together gives the same results as analysing each one alone."""
+
+    def test_near_endgames_match_single_analysis(self):
+        positions = near_endgame_positions()
+        self.assertGreater(len(positions), 20)
+        alone = [analyze(position, 2) for position in positions]
+        self.assertEqual(list(analyze_many(positions, 2, workers=1)), alone)
+        self.assertEqual(list(analyze_many(positions, 2, workers=2, chunksize=4)), alone)
+
+    def test_order_does_not_matter(self):
+        positions = near_endgame_positions(seed=5)
+        alone = [analyze(position, 2) for position in positions]
+        backward = list(analyze_many(positions[::-1], 2, workers=1))
+        self.assertEqual(backward[::-1], alone)
+
+    def test_endgames_are_solved_once(self):
+        generator = random.Random(3)
+        game = QuoridorGame(5, 2)
+        while game.get_player_one().get_fences() or game.get_player_two().get_fences():
+            game.apply(generator.choice(game.legal_fence_placements(game.get_turn())))
+        positions = []
+        while game.get_status() == "IN PROGRESS" and len(positions) < 6:
+            positions.append(encode_position(game))
+            game.apply(("move", generator.choice(game.legal_pawn_moves(game.get_turn()))))
+        analyzer = Analyzer(2)
+        with mock.patch("Engine.solve", wraps=Tablebase.solve) as solve:
+            results = [analyzer.analyze(position) for position in positions]
+        self.assertEqual(solve.call_count, 1)  # every position has the same fences
+        self.assertEqual(results, [analyze(position, 2) for position in positions])
+
+
+if __name__ == "__main__":
+    unittest.main()
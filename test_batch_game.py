@@ -0,0 +1,38 @@
+import random
+import unittest
+
+from GameRecord import action_code, code_action
+from Quoridor import QuoridorGame
+
+try:
+    import numpy
+    from BatchGame import BatchGame
+except ImportError:  # BatchGame needs NumPy
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "BatchGame needs NumPy")
+class BatchGameParityTest(unittest.TestCase):
+    """Tests that BatchGame allows exactly the actions QuoridorGame allows, stepping games in lockstep."""
+
+    def test_legal_actions_match(self):
+        generator = random.Random(9)
+        for size in (3, 5, 9):
+            games = [QuoridorGame(size, 4) for _ in range(12)]
+            batch = BatchGame(len(games), size, 4)
+            for _ in range(60):
+                masks = batch.legal_action_mask()
+                actions = []
+                for game, mask in zip(games, masks):
+                    legal = sorted(action_code(action, size) for action in game.legal_actions())
+                    self.assertEqual(list(numpy.nonzero(mask)[0]), legal)
+                    actions.append(generator.choice(legal) if legal else 0)
+                played = batch.step(numpy.array(actions))
+                for game, code, was_played in zip(games, actions, played):
+                    self.assertEqual(bool(was_played), game.apply(code_action(code, size)) is True)
+                self.assertEqual(list(batch.status), [game.get_winner() for game in games])
+                self.assertEqual(list(batch.turn), [game.get_turn() for game in games])
+
+
+if __name__ == "__main__":
+    unittest.main()
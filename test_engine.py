@@ -0,0 +1,47 @@
+import time
+import unittest
+
+from Engine import Engine
+from Quoridor import QuoridorGame
+from test_self_play import boxed_in_game
+
+
+class EngineTest(unittest.TestCase):
+    """Tests the alpha-beta engine's moves and its time budget."""
+
+    def test_boxed_in_pawn_places_fence(self):
+        game = boxed_in_game(1)
+        self.assertEqual(game.legal_actions(), [("h", (1, 1))])
+        for time_limit_ms, depth in ((50, None), (None, 3)):
+            self.assertEqual(Engine().choose_move(game, time_limit_ms, depth), ("h", (1, 1)))
+
+    def test_boxed_in_pawn_without_fences_passes(self):
+        self.assertIsNone(Engine().choose_move(boxed_in_game(0), 50))
+
+    def test_time_budget(self):
+        engine = Engine()
+        for size in (5, 9):
+            game = QuoridorGame(size)
+            game.apply(("move", (size // 2, 1)))
+            state, key = game.get_state(), game.get_zobrist_key()
+            start = time.perf_counter()
+            action = engine.choose_move(game, 50)
+            self.assertLess(time.perf_counter() - start, 0.5)
+            self.assertIn(action, game.legal_actions())
+            self.assertGreaterEqual(engine.get_search_info()["depth"], 1)
+            self.assertEqual((game.get_state(), game.get_zobrist_key()), (state, key))  # search took every move back
+
+    def test_takes_winning_step(self):
+        game = QuoridorGame(5, 2)
+        game.set_state(((2, 3), (0, 4), 2, 2, 0, 0, 1, "IN PROGRESS"))
+        self.assertEqual(Engine().choose_move(game, None, 2), ("move", (2, 4)))
+
+    def test_undo_limit_is_restored(self):
+        game = QuoridorGame(5, 2)
+        game.set_undo_limit(0)
+        Engine().choose_move(game, None, 2)
+        self.assertEqual(game.get_undo_limit(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from GameRecord import GameReader, GameRecord, GameWriter, decode_position, encode_game, encode_position
+from Quoridor import QuoridorGame
+from test_quoridor import random_games
+
+
+class GameRecordTest(unittest.TestCase):
+    """Tests that game records and encoded positions read back as they were written."""
+
+    def test_position_round_trip(self):
+        for game, _, _ in random_games(10, (2, 5, 9, 11), seed=7):
+            decoded = decode_position(encode_position(game))
+            self.assertEqual(decoded.get_state()[:-1], game.get_state()[:-1])
+            self.assertEqual(decoded.get_winner(), game.get_winner())
+            self.assertEqual(decoded.get_zobrist_key(), game.get_zobrist_key())
+
+    def test_record_round_trip(self):
+        games = list(random_games(8, (5, 9), seed=5))
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            with GameWriter(path, snapshot_interval=4) as writer:
+                for game, actions, fences in games:
+                    writer.write(actions, game.get_size(), fences)
+            with GameReader(path) as reader:
+                self.assertEqual(reader.validate(), len(games))
+                for record, (game, actions, _) in zip(reader, games):
+                    self.assertEqual(list(record.actions()), actions)
+                    self.assertEqual(record.get_result(), game.get_winner())
+                    self.assertEqual(record.replay().get_state(), game.get_state())
+                    self.assertEqual(record.position_at(len(actions)).get_state(), game.get_state())
+        finally:
+            os.remove(path)
+
+    def test_illegal_record_is_refused(self):
+        with self.assertRaises(ValueError):
+            encode_game([("move", (4, 1)), ("move", (4, 2))])  # player two cannot reach (4, 2)
+
+    def test_fences_past_the_board_are_refused(self):
+        for size in (2, 5, 9):
+            data = bytearray(encode_position(QuoridorGame(size)))
+            data[-1] |= 0x80  # highest bit of the vertical mask
+            if size * size % 8:
+                with self.assertRaises(ValueError):
+                    decode_position(bytes(data))
+            data[-1] = 0xff
+            with self.assertRaises(ValueError):
+                decode_position(bytes(data))
+
+    def test_games_that_do_not_fit_are_refused(self):
+        with self.assertRaises(ValueError):
+            encode_game([], 148)  # codes would reach the snapshot marker
+        with self.assertRaises(ValueError):
+            encode_game([], 5, 256)
+        with self.assertRaises(ValueError):
+            encode_game([], 5, 3, 256)
+        with self.assertRaises(ValueError):
+            encode_position(QuoridorGame(5, 256))
+        header = bytearray(encode_game([], 5, 3))
+        header[3] = 148  # board size
+        with self.assertRaises(ValueError):
+            GameRecord(bytes(header), 0)
+        data = encode_game([("move", (73, 1)), ("v", (146, 146))], 147)  # largest board and action code
+        self.assertEqual(list(GameRecord(data, 0).actions()), [("move", (73, 1)), ("v", (146, 146))])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import unittest
+
+from GameServer import Connection, GameServer, Session
+
+
+class FailingWriter:
+    """StreamWriter stand-in whose socket is gone: every drain() fails."""
+
+    def __init__(self):
+        self.closed = False
+
+    def write(self, data):
+        pass
+
+    async def drain(self):
+        raise ConnectionResetError("peer went away")
+
+    def close(self):
+        self.closed = True
+
+
+async def request(reader, writer, message):
+    """Sends one request and reads lines until its answer arrives.
+    :returns: answer dictionary."""
+    writer.write((json.dumps(message) + "\n").encode())
+    await writer.drain()
+    while True:
+        answer = json.loads(await reader.readline())
+        if answer.get("id") == message["id"]:
+            return answer
+
+
+class GameServerTest(unittest.TestCase):
+    """Tests the game server protocol over a local socket and its connection handling."""
+
+    def test_new_game_and_move(self):
+        async def play():
+            server = GameServer()
+            host, port = await server.start()
+            reader, writer = await asyncio.open_connection(host, port)
+            try:
+                game = (await request(reader, writer, {"id": 1, "op": "new", "size": 5}))["game"]
+                answer = await request(reader, writer, {"id": 2, "op": "move", "game": game, "player": 1,
+                                                        "coordinate": [2, 1]})
+                self.assertTrue(answer["ok"])
+                self.assertIs(answer["result"], True)
+                self.assertEqual(answer["state"]["positions"], [[2, 1], [2, 4]])
+                self.assertEqual(answer["state"]["turn"], 2)
+            finally:
+                writer.close()
+                await server.close()
+
+        asyncio.run(play())
+
+    def test_player_must_be_one_or_two(self):
+        async def play():
+            server = GameServer()
+            host, port = await server.start()
+            reader, writer = await asyncio.open_connection(host, port)
+            try:
+                game = (await request(reader, writer, {"id": 1, "op": "new"}))["game"]
+                for number, player in enumerate((True, 1.0, "1", 3), 2):
+                    answer = await request(reader, writer, {"id": number, "op": "move", "game": game,
+                                                            "player": player, "coordinate": [4, 1]})
+                    self.assertFalse(answer["ok"])
+                state = (await request(reader, writer, {"id": 9, "op": "state", "game": game}))["state"]
+                self.assertEqual(state["positions"][0], [4, 0])
+                self.assertEqual(server.evict_idle(0), 1)
+            finally:
+                writer.close()
+                await server.close()
+
+        asyncio.run(play())
+
+    def test_evicted_game_is_rebuilt(self):
+        async def evict():
+            server = GameServer()
+            for game_id in (1, 2, 3):
+                server._sessions[game_id] = Session(game_id, 5, 3)
+            server._sessions[2].get_game().move_pawn(1, (2, 1))
+            self.assertEqual(server.evict_idle(0), 3)
+            self.assertEqual(server.get_stats(), {"games": 3, "live": 0, "evicted": 3})
+            game = server._sessions[2].get_game()
+            self.assertEqual(game.get_state()[:2], ((2, 1), (2, 4)))
+            self.assertEqual(game.get_undo_limit(), 0)
+            self.assertEqual(server.get_stats()["live"], 1)
+
+        asyncio.run(evict())
+
+    def test_board_size_is_capped(self):
+        async def play():
+            server = GameServer(max_size=11)
+            host, port = await server.start()
+            reader, writer = await asyncio.open_connection(host, port)
+            try:
+                self.assertFalse((await request(reader, writer, {"id": 1, "op": "new", "size": 12}))["ok"])
+                self.assertFalse((await request(reader, writer, {"id": 2, "op": "new", "fences": 256}))["ok"])
+                self.assertTrue((await request(reader, writer, {"id": 3, "op": "new", "size": 11}))["ok"])
+            finally:
+                writer.close()
+                await server.close()
+
+        asyncio.run(play())
+        with self.assertRaises(ValueError):
+            GameServer(max_size=256)
+
+    def test_close_ends_client_connections(self):
+        async def play():
+            errors = []
+            asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+            server = GameServer()
+            host, port = await server.start()
+            clients = [await asyncio.open_connection(host, port) for _ in range(3)]
+            for number, (reader, writer) in enumerate(clients):
+                await request(reader, writer, {"id": number, "op": "new"})
+            await server.close()
+            for reader, writer in clients:
+                self.assertEqual(await reader.read(), b"")  # server closed the connection
+                writer.close()
+            self.assertEqual(errors, [])
+
+        asyncio.run(play())
+
+    def test_failed_writer_stops_answers(self):
+        async def answer_until_closed():
+            writer = FailingWriter()
+            connection = Connection(writer, 1)
+            with self.assertRaises(ConnectionResetError):
+                for number in range(10):  # would wait forever on the full queue if the writer's failure went unseen
+                    await asyncio.wait_for(connection.answer({"id": number}), 1)
+            self.assertTrue(writer.closed)
+            await connection.close()
+
+        asyncio.run(answer_until_closed())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import copy
+import json
+import pickle
+import unittest
+
+import Instrumentation
+from Quoridor import PathFinder, QuoridorGame
+
+
+class InstrumentationTest(unittest.TestCase):
+    """Tests switching instrumentation on and off and the counters it collects."""
+
+    def test_counts_fence_placements(self):
+        game = QuoridorGame()
+        instrumentation = Instrumentation.enable(game)
+        self.assertIs(game.get_instrumentation(), instrumentation)
+        for action in [("h", (4, 1)), ("v", (3, 7)), ("h", (2, 5)), ("move", (4, 7))]:
+            self.assertTrue(game.apply(action))
+        self.assertFalse(game.place_fence(1, "h", (4, 1)))  # slot taken, no search run
+        snapshot = instrumentation.snapshot()
+        self.assertEqual(json.loads(json.dumps(snapshot)), snapshot)
+        self.assertEqual(snapshot["calls"]["place_fence"], 4)
+        self.assertEqual(snapshot["calls"]["apply"], 4)
+        self.assertGreater(snapshot["fair_play"]["searches"], 0)
+        self.assertGreaterEqual(snapshot["fair_play"]["nodes"], snapshot["fair_play"]["searches"])
+        self.assertEqual(sum(snapshot["placement_depth_histogram"].values()), 4)
+        self.assertEqual(set(snapshot["seconds"]), set(snapshot["calls"]))
+
+        self.assertIs(Instrumentation.disable(game), instrumentation)
+        self.assertIs(type(game), QuoridorGame)
+        self.assertIs(type(game.get_path_finder()), PathFinder)
+        self.assertIsNone(game.get_instrumentation())
+        game.place_fence(1, "v", (6, 6))
+        self.assertEqual(instrumentation.get_calls()["place_fence"], 4)
+
+    def test_set_state_keeps_counting_searches(self):
+        game = QuoridorGame()
+        instrumentation = Instrumentation.enable(game)
+        game.set_state(QuoridorGame().get_state())
+        self.assertIsNot(type(game.get_path_finder()), PathFinder)
+        searches = instrumentation.get_searches()
+        game.place_fence(1, "h", (4, 1))
+        self.assertGreater(instrumentation.get_searches(), searches)
+
+    def test_copies_are_plain_games(self):
+        game = QuoridorGame()
+        Instrumentation.enable(game)
+        game.apply(("h", (4, 1)))
+        for copied in (pickle.loads(pickle.dumps(game)), copy.deepcopy(game)):
+            self.assertIs(type(copied), QuoridorGame)
+            self.assertIs(type(copied.get_path_finder()), PathFinder)
+            self.assertIsNone(copied.get_instrumentation())
+            self.assertEqual(copied.get_state(), game.get_state())
+            self.assertTrue(copied.move_pawn(2, (4, 7)))
+        self.assertEqual(game.get_instrumentation().get_calls()["apply"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
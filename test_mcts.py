@@ -0,0 +1,31 @@
+import unittest
+
+from MCTS import MCTS
+from Quoridor import QuoridorGame
+from test_self_play import boxed_in_game
+
+
+class MCTSTest(unittest.TestCase):
+    """Tests the Monte Carlo player in the calling process and on a worker pool."""
+
+    def test_choose_move(self):
+        for workers in (1, 2):
+            game = QuoridorGame(5, 3)
+            game.apply(("move", (2, 1)))
+            state = game.get_state()
+            with MCTS(playouts=200, time_limit_ms=None, workers=workers, seed=4) as player:
+                action = player.choose_move(game)
+                self.assertIn(action, game.legal_actions())
+                self.assertEqual(player.get_search_info()["playouts"], 200)
+                self.assertEqual(player.get_search_info()["workers"], workers)
+            self.assertEqual(game.get_state(), state)
+
+    def test_boxed_in_pawn_places_fence(self):
+        for workers in (1, 2):
+            with MCTS(playouts=20, time_limit_ms=None, workers=workers, seed=4) as player:
+                self.assertEqual(player.choose_move(boxed_in_game(1)), ("h", (1, 1)))
+                self.assertIsNone(player.choose_move(boxed_in_game(0)))
+
+
+if __name__ == "__main__":
+    unittest.main()
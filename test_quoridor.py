@@ -0,0 +1,241 @@
+import random
+import unittest
+
+from Quoridor import QuoridorGame
+
+
+def game_at(pawn_one, pawn_two, fences=(), turn=1, size=9):
+    """:returns: game with pawns on pawn_one and pawn_two, the given (fence_direction, coordinate) fences placed and
+    turn to move."""
+    horizontal = vertical = 0
+    for fence_direction, (x, y) in fences:
+        if fence_direction == "h":
+            horizontal |= 1 << (y * size + x)
+        else:
+            vertical |= 1 << (y * size + x)
+    game = QuoridorGame(size)
+    game.set_state((pawn_one, pawn_two, 10, 10, horizontal, vertical, turn, "IN PROGRESS"))
+    return game
+
+
+def random_games(count, sizes, seed, max_plies=80):
+    """Yields (game, actions, fences per player at the start) for random games, each action played already."""
+    generator = random.Random(seed)
+    for _ in range(count):
+        size = generator.choice(sizes)
+        fences = generator.choice((2, 5, 10))
+        game = QuoridorGame(size, fences)
+        actions = []
+        while game.get_status() == "IN PROGRESS" and len(actions) < max_plies:
+            legal = game.legal_actions()
+            if not legal:
+                break
+            actions.append(generator.choice(legal))
+            game.apply(actions[-1])
+        yield game, actions, fences
+
+
+class PawnMoveTest(unittest.TestCase):
+    """Tests steps, jumps and diagonal moves around the other pawn."""
+
+    def test_opening_moves(self):
+        game = QuoridorGame()
+        self.assertFalse(game.move_pawn(2, (4, 7)))  # player one moves first
+        self.assertFalse(game.move_pawn(1, (5, 1)))  # diagonal without a pawn to step around
+        self.assertFalse(game.move_pawn(1, (4, 2)))  # two spaces without a pawn to jump
+        self.assertTrue(game.move_pawn(1, (4, 1)))
+        self.assertEqual(game.get_turn(), 2)
+        self.assertEqual(sorted(game.legal_pawn_moves(2)), [(3, 8), (4, 7), (5, 8)])
+
+    def test_straight_jump(self):
+        game = game_at((4, 3), (4, 4))
+        self.assertFalse(game.move_pawn(1, (4, 4)))  # square taken
+        self.assertFalse(game.move_pawn(1, (3, 4)))  # diagonal only when the jump is blocked
+        self.assertTrue(game.is_pawn_jump(1, (4, 3), (4, 5)))
+        self.assertTrue(game.move_pawn(1, (4, 5)))
+
+    def test_fence_behind_pawn_allows_diagonal(self):
+        game = game_at((4, 3), (4, 4), [("h", (4, 5))])
+        self.assertFalse(game.move_pawn(1, (4, 5)))
+        self.assertEqual(sorted(game.legal_pawn_moves(1)), [(3, 3), (3, 4), (4, 2), (5, 3), (5, 4)])
+        self.assertTrue(game.move_pawn(1, (5, 4)))
+
+    def test_edge_behind_pawn_allows_diagonal(self):
+        game = game_at((4, 7), (4, 8))
+        self.assertIn((3, 8), game.legal_pawn_moves(1))
+        self.assertTrue(game.move_pawn(1, (3, 8)))
+        self.assertEqual(game.get_status(), "PLAYER 1 WINS")
+        self.assertEqual(game.get_winner(), 1)
+        self.assertFalse(game.move_pawn(2, (4, 7)))  # game is over
+
+    def test_fence_blocks_diagonal_side(self):
+        game = game_at((4, 3), (4, 4), [("h", (4, 5)), ("v", (4, 4))])
+        self.assertFalse(game.move_pawn(1, (3, 4)))  # fence between the other pawn and (3, 4)
+        self.assertTrue(game.move_pawn(1, (5, 4)))
+
+
+class FenceTest(unittest.TestCase):
+    """Tests fence placement and blocking."""
+
+    def test_fence_blocks_step(self):
+        game = QuoridorGame()
+        self.assertTrue(game.place_fence(1, "h", (4, 1)))
+        self.assertTrue(game.check_fence_block((4, 0), (4, 1)))
+        self.assertFalse(game.check_fence_block((4, 0), (3, 0)))
+        self.assertTrue(game.move_pawn(2, (4, 7)))
+        self.assertFalse(game.move_pawn(1, (4, 1)))
+        self.assertTrue(game.move_pawn(1, (3, 0)))
+        self.assertEqual(game.get_player_one().get_fences(), 9)
+
+    def test_invalid_placements(self):
+        game = QuoridorGame(fences=1)
+        self.assertFalse(game.place_fence(2, "h", (4, 4)))  # out of turn
+        self.assertFalse(game.place_fence(1, "h", (4, 9)))  # off the board
+        self.assertFalse(game.place_fence(1, "x", (4, 4)))
+        self.assertTrue(game.place_fence(1, "h", (4, 4)))
+        self.assertFalse(game.place_fence(2, "h", (4, 4)))  # slot taken
+        self.assertTrue(game.place_fence(2, "v", (4, 4)))
+        self.assertFalse(game.place_fence(1, "v", (5, 5)))  # no fences left
+        self.assertEqual(game.legal_fence_placements(1), [])
+
+
+class PlayerTest(unittest.TestCase):
+    """Tests that the game reads each pawn's square from its Player."""
+
+    def test_set_position_moves_pawn_for_the_game(self):
+        game = QuoridorGame()
+        game.get_player_one().set_position((4, 6))
+        self.assertEqual(game.get_board()[(4, 6)], ["P1"])
+        self.assertEqual(game.shortest_path_length(1), 2)
+        self.assertTrue(game.move_pawn(1, (4, 7)))
+        self.assertTrue(game.undo())
+        self.assertEqual(game.get_player_one().get_player_position(), (4, 6))
+
+
+class FairPlayTest(unittest.TestCase):
+    """Tests that no fence may cut either player off from their goal row."""
+
+    def test_fair_play_rule(self):
+        game = QuoridorGame(3, 3)
+        self.assertTrue(game.place_fence(1, "h", (0, 1)))
+        self.assertTrue(game.place_fence(2, "h", (1, 1)))
+        state = game.get_state()
+        self.assertEqual(game.place_fence(1, "h", (2, 1)), "breaks the fair play rule")
+        self.assertEqual(game.get_state(), state)  # fence taken off again, turn and fence count unchanged
+        self.assertNotIn(("h", (2, 1)), game.legal_fence_placements(1))
+        self.assertEqual(game.shortest_path_length(1), 3)
+
+    def test_fair_play_rule_protects_mover(self):
+        game = game_at((0, 4), (8, 8), [("v", (1, 3)), ("v", (1, 4)), ("h", (0, 3))])
+        self.assertEqual(game.place_fence(1, "h", (0, 5)), "breaks the fair play rule")  # walls in player one
+        self.assertTrue(game.place_fence(1, "h", (0, 6)))
+
+
+class ApplyUndoTest(unittest.TestCase):
+    """Tests that undo() restores positions exactly."""
+
+    def test_undo_restores_every_position(self):
+        for game, actions, _ in random_games(12, (9,), seed=3):
+            history = []
+            while True:
+                history.append((game.get_state(), game.legal_actions()))
+                if not game.undo():
+                    break
+            self.assertEqual(len(history), len(actions) + 1)
+            for action, (state, legal) in zip(actions, reversed(history)):
+                self.assertEqual(game.get_state(), state)
+                self.assertEqual(game.legal_actions(), legal)
+                self.assertTrue(game.apply(action))
+
+
+class ZobristKeyTest(unittest.TestCase):
+    """Tests that Zobrist keys follow the position through apply(), undo() and set_state()."""
+
+    def test_keys_follow_apply_and_undo(self):
+        for game, actions, _ in random_games(12, (9,), seed=3):
+            keys = []
+            while True:
+                rebuilt = QuoridorGame(game.get_size())
+                rebuilt.set_state(game.get_state())
+                self.assertEqual(rebuilt.get_zobrist_key(), game.get_zobrist_key())
+                keys.append(game.get_zobrist_key())
+                if not game.undo():
+                    break
+            for action, key in zip(actions, reversed(keys)):
+                self.assertEqual(game.get_zobrist_key(), key)
+                game.apply(action)
+
+    def test_equal_positions_have_equal_keys(self):
+        one, two = QuoridorGame(), QuoridorGame()
+        for action in [("move", (4, 1)), ("h", (2, 2)), ("move", (4, 2)), ("v", (6, 6))]:
+            one.apply(action)
+        for action in [("move", (4, 1)), ("v", (6, 6)), ("move", (4, 2)), ("h", (2, 2))]:
+            two.apply(action)
+        self.assertEqual(one.get_state(), two.get_state())
+        self.assertEqual(one.get_zobrist_key(), two.get_zobrist_key())
+        self.assertNotEqual(one.get_zobrist_key(), QuoridorGame().get_zobrist_key())
+
+    def test_refused_fence_leaves_key_unchanged(self):
+        game = QuoridorGame(3, 3)
+        game.place_fence(1, "h", (0, 1))
+        game.place_fence(2, "h", (1, 1))
+        key = game.get_zobrist_key()
+        self.assertEqual(game.place_fence(1, "h", (2, 1)), "breaks the fair play rule")
+        self.assertEqual(game.get_zobrist_key(), key)
+
+    def test_set_position_changes_key(self):
+        game = QuoridorGame()
+        key = game.get_zobrist_key()
+        game.get_player_one().set_position((4, 6))
+        self.assertNotEqual(game.get_zobrist_key(), key)
+
+
+class UndoLimitTest(unittest.TestCase):
+    """Tests that the undo limit bounds the undo records a game keeps."""
+
+    def test_undo_limit(self):
+        game = QuoridorGame()
+        game.set_undo_limit(1)
+        game.apply(("move", (4, 1)))
+        game.apply(("move", (4, 7)))
+        self.assertTrue(game.undo())
+        self.assertFalse(game.undo())  # older record was dropped
+        self.assertEqual(game.get_state()[0], (4, 1))
+
+    def test_no_undo_records(self):
+        game = QuoridorGame()
+        game.apply(("move", (4, 1)))
+        game.set_undo_limit(0)
+        self.assertFalse(game.undo())  # existing records are dropped too
+        self.assertTrue(game.apply(("h", (2, 2))))
+        self.assertFalse(game.undo())
+        self.assertEqual(game.get_player_two().get_fences(), 9)
+
+
+class BoardSizeTest(unittest.TestCase):
+    """Tests the rules on boards other than 9x9."""
+
+    def test_start_positions(self):
+        for size in range(2, 12):
+            game = QuoridorGame(size, 4)
+            self.assertEqual(game.get_state()[:4], ((size // 2, 0), (size // 2, size - 1), 4, 4))
+            self.assertEqual(game.shortest_path_length(1), size - 1)
+            self.assertEqual(len(game.legal_fence_placements(1)), 2 * size * (size - 1))
+
+    def test_undo_on_every_size(self):
+        for game, actions, _ in random_games(20, tuple(range(2, 12)), seed=13):
+            keys = [game.get_zobrist_key()]
+            states = [game.get_state()]
+            while game.undo():
+                keys.append(game.get_zobrist_key())
+                states.append(game.get_state())
+            self.assertEqual(len(states), len(actions) + 1)
+            start = QuoridorGame(game.get_size(), game.get_player_one().get_fences())
+            self.assertEqual(states[-1], start.get_state())
+            for action, state, key in zip(actions, reversed(states), reversed(keys)):
+                self.assertEqual((game.get_state(), game.get_zobrist_key()), (state, key))
+                game.apply(action)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from Quoridor import QuoridorGame
+from SelfPlay import GreedyPlayer, RandomPlayer, main, play_game
+
+
+def boxed_in_game(fences_left):
+    """:returns: 2x2 game where player one, to move, is boxed in by the other pawn and two fences."""
+    game = QuoridorGame(2, 1)
+    vertical = 1 << 1 | 1 << 3  # left edges of (1, 0) and (1, 1)
+    game.set_state(((0, 0), (0, 1), fences_left, 0, 0, vertical, 1, "IN PROGRESS"))
+    return game
+
+
+class SelfPlayTest(unittest.TestCase):
+    """Tests the self-play players and game loop."""
+
+    def test_players_pass_when_boxed_in(self):
+        game = boxed_in_game(0)
+        self.assertEqual(game.legal_actions(), [])
+        for seed in range(20):
+            self.assertIsNone(RandomPlayer(seed).choose_move(game))
+            self.assertIsNone(GreedyPlayer(seed).choose_move(game))
+
+    def test_random_player_places_fence_when_boxed_in(self):
+        game = boxed_in_game(1)
+        for seed in range(20):
+            action = RandomPlayer(seed).choose_move(game)
+            self.assertIn(action, game.legal_actions())
+
+    def test_games_finish(self):
+        for number, players in enumerate((("random", "greedy"), ("greedy", "random"), ("random", "random"))):
+            record = play_game((number, players[0], players[1], number, 200, 5, 3))
+            self.assertEqual(record["plies"], len(record["moves"]))
+            self.assertIn(record["winner"], ("A", "B", None))
+
+
+class ResumeTest(unittest.TestCase):
+    """Tests that an interrupted run resumes from its output file, and only with the same settings."""
+
+    def setUp(self):
+        handle, self._path = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self._path)
+
+    def run_games(self, games, *extra):
+        """Runs SelfPlay.main() quietly on small boards.
+        :returns: summary dictionary."""
+        with contextlib.redirect_stdout(io.StringIO()):
+            return main(["--games", str(games), "--workers", "1", "--size", "5", "--fences", "3", "--output",
+                         self._path, "--player-a", "greedy", "--player-b", "random"] + list(extra))
+
+    def test_resume_finishes_run(self):
+        first = self.run_games(4)
+        with open(self._path, "a") as output:
+            output.write('{"game": 9, "winner"')  # interrupted while writing a game
+        summary = self.run_games(6, "--resume")
+        self.assertEqual(summary["games"], 6)
+        self.assertEqual(summary["games_this_run"], 2)
+        self.assertGreaterEqual(summary["moves"], first["moves"])
+        with open(self._path) as output:
+            lines = [json.loads(line) for line in output]
+        self.assertIn("run", lines[0])
+        self.assertEqual(sorted(line["game"] for line in lines[1:]), list(range(6)))
+        self.assertAlmostEqual(summary["win_rate_a"], sum(line["winner"] == "A" for line in lines[1:]) / 6)
+
+    def test_resume_refuses_other_settings(self):
+        self.run_games(2)
+        for extra in (["--player-b", "greedy"], ["--seed", "1"], ["--size", "7"], ["--fences", "2"]):
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                self.run_games(4, "--resume", *extra)
+        self.assertEqual(self.run_games(2, "--resume")["games_this_run"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
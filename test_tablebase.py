@@ -0,0 +1,141 @@
+import os
+import random
+import tempfile
+import unittest
+
+from Engine import Engine
+from Quoridor import QuoridorGame
+from Tablebase import DRAW, LOSS, WIN, Tablebase, TablebaseFile, solve, write_tablebases
+
+
+def random_layout(size, fences, seed):
+    """:returns: (horizontal, vertical) fence bitmasks after placing up to fences random legal fences."""
+    generator = random.Random(seed)
+    game = QuoridorGame(size, fences)
+    while game.get_player_two().get_fences() > 0:
+        placements = game.legal_fence_placements(game.get_turn())
+        if not placements:
+            break
+        game.apply(generator.choice(placements))
+    return game.get_state()[4:6]
+
+
+def endgame(size, horizontal, vertical, square_one=None, square_two=None, turn=1):
+    """:returns: game on the layout with both players out of fences, pawns on their start squares unless given."""
+    game = QuoridorGame(size, 0)
+    position_one, position_two = game.get_state()[:2]
+    if square_one is not None:
+        position_one = (square_one % size, square_one // size)
+        position_two = (square_two % size, square_two // size)
+    game.set_state((position_one, position_two, 0, 0, horizontal, vertical, turn, "IN PROGRESS"))
+    return game
+
+
+def brute_force(size, horizontal, vertical):
+    """Solves a layout by repeated full-width one-move lookahead until nothing changes, scoring positions the way
+    Tablebase encodes them.
+    :returns: list of encoded results indexed by Tablebase.index()."""
+    squares = size * size
+    game = endgame(size, horizontal, vertical)
+    children = {}
+    values = [0] * (2 * squares * squares)
+    for turn in (1, 2):
+        for square_one in range(squares):
+            for square_two in range(squares):
+                if square_one == square_two:
+                    continue
+                position = Tablebase.index(size, square_one, square_two, turn)
+                if square_one // size == size - 1 or square_two // size == 0:
+                    values[position] = -1  # the player who just moved has won
+                    continue
+                game.set_state(((square_one % size, square_one // size), (square_two % size, square_two // size),
+                                0, 0, horizontal, vertical, turn, "IN PROGRESS"))
+                children[position] = []
+                for x, y in game.legal_pawn_moves(turn):
+                    if turn == 1:
+                        children[position].append(Tablebase.index(size, y * size + x, square_two, 2))
+                    else:
+                        children[position].append(Tablebase.index(size, square_one, y * size + x, 1))
+    changed = True
+    while changed:
+        changed = False
+        previous = list(values)
+        for position, moves in children.items():
+            results = [previous[move] for move in moves]
+            losses = [-result - 1 for result in results if result < 0]
+            if losses:
+                value = min(losses) + 1  # win by moving to the quickest loss for the opponent
+            elif not results or 0 in results:
+                value = 0
+            else:
+                value = -(max(results) + 2)  # every move lets the opponent win, put it off as long as possible
+            if value != values[position]:
+                values[position] = value
+                changed = True
+    return values
+
+
+class TablebaseTest(unittest.TestCase):
+    """Tests solving layouts and storing them in a tablebase file."""
+
+    def test_solve_matches_brute_force(self):
+        for seed in range(4):
+            horizontal, vertical = random_layout(4, 3, seed)
+            tablebase = solve(4, horizontal, vertical)
+            self.assertEqual(list(tablebase.get_values()), brute_force(4, horizontal, vertical))
+
+    def test_best_moves_follow_the_results(self):
+        opposite = {WIN: LOSS, LOSS: WIN}
+        for seed in range(4):
+            horizontal, vertical = random_layout(5, 2, seed)
+            tablebase = solve(5, horizontal, vertical)
+            game = endgame(5, horizontal, vertical)
+            self.assertTrue(tablebase.matches(game))
+            result, moves = tablebase.probe(game)
+            while result != DRAW and moves > 0:
+                self.assertTrue(game.apply(tablebase.best_move(game)))
+                self.assertEqual(tablebase.probe(game), (opposite[result], moves - 1))
+                result, moves = tablebase.probe(game)
+            self.assertEqual(game.get_status() != "IN PROGRESS", result != DRAW)
+
+    def test_file_round_trip(self):
+        layouts = [random_layout(4, 3, seed) for seed in range(5)]
+        layouts = list(dict.fromkeys(layouts))  # drop repeated layouts
+        tablebases = [solve(4, horizontal, vertical) for horizontal, vertical in layouts]
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            write_tablebases(path, tablebases)
+            with TablebaseFile(path) as tablebase_file:
+                self.assertEqual((len(tablebase_file), tablebase_file.get_size()), (len(layouts), 4))
+                for (horizontal, vertical), tablebase in zip(layouts, tablebases):
+                    found = tablebase_file.find(4, horizontal, vertical)
+                    self.assertEqual(list(found.get_values()), list(tablebase.get_values()))
+                    self.assertIs(tablebase_file.find_game(endgame(4, horizontal, vertical)), found)
+                    for _ in range(100):
+                        tablebase_file.find(4, horizontal, vertical)
+                self.assertLessEqual(len(tablebase_file._exports), 2 * len(layouts))  # one set of views per layout
+                self.assertIsNone(tablebase_file.find(4, 1 << 5, 0))
+                self.assertIsNone(tablebase_file.find(5, *layouts[0]))
+        finally:
+            os.remove(path)
+
+    def test_engine_keeps_few_layouts_from_the_file(self):
+        layouts = list(dict.fromkeys(random_layout(4, 3, seed) for seed in range(8)))
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            write_tablebases(path, [solve(4, horizontal, vertical) for horizontal, vertical in layouts])
+            with TablebaseFile(path) as tablebase_file:
+                engine = Engine(tablebases=tablebase_file, solve_endgames=False)
+                engine.SOLVED_LAYOUTS = 2
+                for horizontal, vertical in layouts:
+                    self.assertIsNotNone(engine.choose_move(endgame(4, horizontal, vertical), 50))
+                    self.assertEqual(engine.get_search_info()["depth"], 0)  # played from the tablebase
+                    self.assertLessEqual(len(engine._solved), 2)
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    unittest.main()